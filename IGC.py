@@ -2,30 +2,41 @@
 # Corrige: ignora Threads, resuelve linkshim (l.instagram.com/?u=), abre el modal "… y N más".
 #
 # Uso:
-#   python IGC.py --users-file users.txt --out ig_contacts.csv --jsonl ig_contacts.jsonl
+#   python IGC.py --users-file users.txt --out ig_contacts.csv --jsonl ig_contacts.jsonl --workers 4
+#   python IGC.py --refresh-older-than 30d     # re-scrapea solo registros de más de 30 días
+#
+# Reanudación: los perfiles ya escritos se anotan en <out>.idx (username<TAB>ts)
+# y se saltean en la siguiente corrida. Si el .idx falta, se reconstruye del CSV/JSONL.
 #
 # Requisitos:
 #   pip install playwright
 #   python -m playwright install chromium
 
-import asyncio, csv, re, time, random, json, urllib.parse
+import argparse, asyncio, csv, re, time, random, json, urllib.parse
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Set
-from urllib.parse import urlparse, parse_qs, unquote
-from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+from typing import Callable, Dict, Iterable, List, Set
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PWTimeout
+from ig_lightweight import ResourceFilter
+from ig_profile_parse import find_user_node, norm_url, profile_from_html, profile_from_payload
+from ig_runtime import context_scope, login_wall, runtime_scope
 
 USERS_FILE   = "users.txt"
 USER_DATA    = "./ig_profile"           # sesión persistente
 OUT_CSV      = "ig_contacts.csv"
 OUT_JSONL    = None                     # e.g. "ig_contacts.jsonl"
-DELAY_MS     = 250
+DELAY_MS     = 250                      # pausa entre perfiles (por worker)
+WORKERS      = 3                        # páginas en paralelo dentro de la sesión
 OPEN_TIMEOUT = 45000
+NET_WAIT_MS  = 4000                     # espera máxima del JSON del perfil tras la navegación
+NET_GRACE_MS = 300                      # margen tras el evento load: si el JSON no llegó, va por HTML
+EXTRACT_MODE = "network"                # "network" (JSON de respuestas) | "html" (page.content + regex)
+LIGHTWEIGHT  = True                     # bloquea imágenes/video/fuentes (ver ig_lightweight.py)
 
 def rand(a,b): return a + random.random()*(b-a)
 
 EMAIL_RE      = re.compile(r'\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b')
-URL_JSON_RE   = re.compile(r'"(?:external_url|url)"\s*:\s*"(https?://[^"]+)"')
-BIO_RE        = re.compile(r'"biography"\s*:\s*"(.*?)"', re.S)
 
 # Hosts que NO queremos (Threads, ayuda IG, etc.)
 EXCLUDE_HOSTS = {
@@ -36,27 +47,6 @@ EXCLUDE_HOSTS = {
 # Dominios IG propios (se permiten solo para linkshim)
 INSTAGRAM_HOSTS = {"www.instagram.com", "instagram.com", "l.instagram.com"}
 
-def unshim_instagram(url: str) -> str:
-    """Si el link viene desde l.instagram.com, devuelve el destino real (parámetro u=)."""
-    try:
-        p = urlparse(url)
-        if p.hostname and p.hostname.lower() == "l.instagram.com":
-            qs = parse_qs(p.query)
-            if "u" in qs and qs["u"]:
-                return unquote(qs["u"][0])
-    except:  # noqa
-        pass
-    return url
-
-def norm_url(u: str) -> str:
-    if not u: return ""
-    u = u.strip().replace("\\u0026", "&").replace("\\/", "/")
-    u = unshim_instagram(u)
-    # normaliza esquema
-    if u.startswith("//"):
-        u = "https:" + u
-    return u
-
 def is_allowed_external(u: str) -> bool:
     try:
         h = (urlparse(u).hostname or "").lower()
@@ -91,8 +81,7 @@ def categorize(links: List[str]) -> Dict[str, List[str]]:
 
 async def ensure_login(page):
     if "login" in page.url or "/accounts/login" in page.url:
-        print("➡️ Inicia sesión en la ventana y presiona ENTER aquí…")
-        input()
+        await login_wall(page)
 
 async def accept_cookies(page):
     try:
@@ -166,19 +155,84 @@ async def collect_links_from_dialog(dlg) -> Set[str]:
             out.add(href)
     return out
 
-# ---------- Scrape perfil ----------
-async def scrape_profile_contacts(page, user: str) -> Dict:
-    profile_url = await goto_profile(page, user)
+# Endpoints que traen el perfil como JSON
+PROFILE_API_HINTS = ("web_profile_info", "/graphql", "/api/v1/users/")
 
-    # 1) HTML (bio + urls desde JSON embebido)
-    html = await page.content()
+class ProfilePayloadCapture:
+    """Escucha las respuestas JSON de la página y se queda con la del perfil pedido."""
 
-    # Bio desde JSON embebido
-    bio = ""
-    m = BIO_RE.search(html)
-    if m:
-        bio = m.group(1)
-        bio = bio.encode("utf-8").decode("unicode_escape").replace("\\n", " ").strip()
+    def __init__(self, page, user: str):
+        self.page, self.user = page, user
+        self.node: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.raw = None
+
+    async def _on_response(self, resp):
+        if self.node.done():
+            return
+        try:
+            if resp.request.resource_type not in ("xhr", "fetch"):
+                return
+            if not any(h in resp.url for h in PROFILE_API_HINTS):
+                return
+            data = await resp.json()
+        except:  # noqa
+            return
+        node = find_user_node(data, self.user)
+        if node and not self.node.done():
+            self.raw = data
+            self.node.set_result(node)
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def detach(self):
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except:  # noqa
+            pass
+
+    async def wait(self, timeout_ms: int, grace_ms: int = NET_GRACE_MS) -> Dict|None:
+        """
+        Espera el JSON del perfil hasta timeout_ms, pero deja de esperar grace_ms
+        después del evento load: si el perfil vino embebido en el HTML, no
+        llega ningún XHR y no tiene sentido agotar el timeout.
+        """
+        async def loaded():
+            try:
+                await self.page.wait_for_load_state("load", timeout=timeout_ms)
+            except PWTimeout:
+                pass
+            await asyncio.sleep(grace_ms/1000.0)
+        load_task = asyncio.ensure_future(loaded())
+        try:
+            await asyncio.wait({self.node, load_task}, timeout=timeout_ms/1000.0,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            load_task.cancel()
+        return self.node.result() if self.node.done() else None
+
+# ---------- Scrape perfil ----------
+async def scrape_profile_contacts(page, user: str, mode: str = EXTRACT_MODE, fixtures_dir: str|None = None) -> Dict:
+    # 1) bio + urls: del JSON del perfil interceptado en la red; si no llega,
+    #    fallback a page.content() + regex sobre el HTML
+    capture = ProfilePayloadCapture(page, user).attach()
+    try:
+        profile_url = await goto_profile(page, user)
+        node = await capture.wait(NET_WAIT_MS) if mode == "network" else None
+    finally:
+        capture.detach()
+    html = None
+    if node:
+        bio, json_links = profile_from_payload(node)
+        source = "network"
+    else:
+        html = await page.content()
+        bio, json_links = profile_from_html(html)
+        source = "html"
+
+    if fixtures_dir:
+        save_fixture(fixtures_dir, user, html if html is not None else await page.content(), capture.raw)
 
     # 2) Links desde DOM visibles debajo de la bio (excluyendo header badges)
     dom_links: Set[str] = set()
@@ -199,10 +253,7 @@ async def scrape_profile_contacts(page, user: str) -> Dict:
         finally:
             await close_dialog(more_dlg)
 
-    # 4) URLs también desde JSON embebido
-    json_links = set(norm_url(u) for u in URL_JSON_RE.findall(html) if u)
-
-    # Merge y filtro final (para evitar meta.ai/threads/etc. aunque aparezcan en JSON)
+    # 4) Merge y filtro final (para evitar meta.ai/threads/etc. aunque aparezcan en JSON)
     all_links = {u for u in (dom_links | json_links) if is_allowed_external(u)}
 
     # 5) Emails (bio + mailto)
@@ -229,17 +280,150 @@ async def scrape_profile_contacts(page, user: str) -> Dict:
         "mailto_links": cats["mailto"],
         "tel_links": cats["tel"],
         "other_links": cats["other"],
+        "source": source,
         "ts": int(time.time()),
     }
 
+def save_fixture(fixtures_dir: str, user: str, html: str, payload):
+    """Guarda HTML (y el JSON si se capturó) para bench_profile_extraction.py."""
+    d = Path(fixtures_dir)
+    d.mkdir(parents=True, exist_ok=True)
+    (d / f"{user}.html").write_text(html, encoding="utf-8")
+    if payload is not None:
+        (d / f"{user}.json").write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+def clean_users(lines: Iterable[str]) -> List[str]:
+    users, seen = [], set()
+    for line in lines:
+        u = line.strip().lstrip("@")
+        if u and u.lower() not in seen:
+            seen.add(u.lower())
+            users.append(u)
+    return users
+
 def read_users(path: str) -> List[str]:
-    users = []
     with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            u = line.strip().lstrip("@")
-            if u:
-                users.append(u)
-    return users
+        return clean_users(f)
+
+# ---------- Reanudación ----------
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7*86400}
+AGE_RE    = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw]?)$")
+
+def parse_age(txt: str) -> int:
+    """'30d', '12h', '90m', '3600s' -> segundos (un número solo = días)."""
+    m = AGE_RE.match((txt or "").strip().lower())
+    if not m:
+        raise ValueError(f"edad inválida: {txt!r} (ej.: 30d, 12h, 90m, 3600s)")
+    return int(float(m.group(1)) * AGE_UNITS[m.group(2) or "d"])
+
+def age_arg(txt: str) -> str:
+    """type= de argparse: valida la edad y la deja como texto para main()."""
+    try:
+        parse_age(txt)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return txt
+
+class ResumeIndex:
+    """
+    username (minúsculas) -> ts del último registro escrito. Vive en un sidecar
+    <out_csv>.idx que se va extendiendo con cada fila; si no existe se arma una
+    vez leyendo el CSV (y el JSONL si hay).
+    """
+
+    def __init__(self, out_csv: str, out_jsonl: str|None = None):
+        self.path = Path(out_csv + ".idx")
+        self.ts: Dict[str, int] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    u, _, ts = line.rstrip("\n").partition("\t")
+                    if u:
+                        self.ts[u] = max(self.ts.get(u, 0), int(ts or 0))
+        else:
+            self._rebuild(out_csv, out_jsonl)
+        self.f = open(self.path, "a", encoding="utf-8")
+
+    def _rebuild(self, out_csv: str, out_jsonl: str|None):
+        if Path(out_csv).exists():
+            with open(out_csv, "r", newline="", encoding="utf-8") as f:
+                r = csv.reader(f)
+                next(r, None)  # header
+                for row in r:
+                    if row and row[0]:
+                        self._note(row[0], row[-1])
+        if out_jsonl and Path(out_jsonl).exists():
+            with open(out_jsonl, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        d = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._note(d.get("user", ""), d.get("ts", 0))
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{u}\t{ts}\n" for u, ts in self.ts.items()))
+
+    def _note(self, user: str, ts):
+        try:
+            ts = int(ts)
+        except (TypeError, ValueError):
+            ts = 0
+        if user:
+            u = user.lower()
+            self.ts[u] = max(self.ts.get(u, 0), ts)
+
+    def is_fresh(self, user: str, max_age_s: int|None = None) -> bool:
+        """True si ya está scrapeado (y, con max_age_s, si no está vencido)."""
+        ts = self.ts.get(user.lower())
+        if ts is None:
+            return False
+        return max_age_s is None or ts >= time.time() - max_age_s
+
+    def add(self, user: str, ts: int):
+        self._note(user, ts)
+        self.f.write(f"{user.lower()}\t{ts}\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def drop_stale_rows(out_csv: str, out_jsonl: str|None, users: Set[str], before: int) -> int:
+    """
+    Reescribe CSV (y JSONL) sin las filas anteriores a `before` de `users`
+    (minúsculas), que se acaban de re-scrapear: cada perfil queda con una sola fila.
+    """
+    dropped = 0
+    def stale(user, ts) -> bool:
+        try:
+            return str(user).lower() in users and int(ts) < before
+        except (TypeError, ValueError):
+            return False
+    src = Path(out_csv)
+    tmp = src.with_suffix(src.suffix + ".tmp")
+    with open(src, "r", newline="", encoding="utf-8") as fin, open(tmp, "w", newline="", encoding="utf-8") as fout:
+        r, w = csv.reader(fin), csv.writer(fout)
+        header = next(r, None)
+        if header:
+            w.writerow(header)
+        for row in r:
+            if row and stale(row[0], row[-1]):
+                dropped += 1
+                continue
+            w.writerow(row)
+    tmp.replace(src)
+    if out_jsonl and Path(out_jsonl).exists():
+        src = Path(out_jsonl)
+        tmp = src.with_suffix(src.suffix + ".tmp")
+        with open(src, "r", encoding="utf-8") as fin, open(tmp, "w", encoding="utf-8") as fout:
+            for line in fin:
+                try:
+                    d = json.loads(line)
+                except ValueError:
+                    d = {}
+                if not stale(d.get("user", ""), d.get("ts", 0)):
+                    fout.write(line)
+        tmp.replace(src)
+    return dropped
 
 def write_csv_row(w, row: Dict):
     w.writerow([
@@ -256,13 +440,83 @@ def write_csv_row(w, row: Dict):
         row["ts"],
     ])
 
-async def main(users_file=USERS_FILE, out_csv=OUT_CSV, out_jsonl=OUT_JSONL, delay_ms=DELAY_MS):
-    users = read_users(users_file)
+class OrderedRowWriter:
+    """Escribe las filas en el orden de users.txt aunque los workers terminen desordenados."""
+
+    def __init__(self, w, csv_f, jsonl_f, index: ResumeIndex|None = None, on_row: Callable[[Dict], None]|None = None):
+        self.w, self.csv_f, self.jsonl_f, self.index, self.on_row = w, csv_f, jsonl_f, index, on_row
+        self.next_i = 0
+        self.buf: Dict[int, Dict|None] = {}
+        self.written: Set[str] = set()   # usernames (minúsculas) escritos en esta corrida
+        self.sources: Counter = Counter()  # network / html por fila escrita
+
+    def add(self, i: int, data: Dict|None):
+        self.buf[i] = data
+        while self.next_i in self.buf:
+            row = self.buf.pop(self.next_i)
+            self.next_i += 1
+            if row is None:   # perfil con error: no se escribe, solo libera el orden
+                continue
+            write_csv_row(self.w, row)
+            self.written.add(row["user"].lower())
+            self.sources[row["source"]] += 1
+            if self.jsonl_f:
+                self.jsonl_f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.csv_f.flush()
+            if self.jsonl_f:
+                self.jsonl_f.flush()
+            # el índice va después de la fila: ante un corte, a lo sumo se repite un perfil
+            if self.index:
+                self.index.add(row["user"], row["ts"])
+            if self.on_row:
+                self.on_row(row)
+
+async def profile_worker(n: int, ctx, jobs: asyncio.Queue, out: OrderedRowWriter, total: int, delay_ms: int,
+                         mode: str = EXTRACT_MODE, fixtures_dir: str|None = None):
+    """Una página propia que consume perfiles de la cola compartida, con su propio ritmo."""
+    page = await ctx.new_page()
+    try:
+        while True:
+            try:
+                i, user = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            data = None
+            try:
+                print(f"[{i+1}/{total}] (w{n}) @{user}…")
+                data = await scrape_profile_contacts(page, user, mode, fixtures_dir)
+                print(f"  ✓ @{user} emails={len(data['emails'])} links={len(data['links_all'])} "
+                      f"website={data['website'] or '-'} [{data['source']}]")
+            except Exception as e:
+                print(f"  ⚠️ error @{user}: {e}")
+            out.add(i, data)
+            await asyncio.sleep(delay_ms/1000.0 * rand(0.8, 1.2))
+    finally:
+        await page.close()
+
+async def main(users_file=USERS_FILE, out_csv=OUT_CSV, out_jsonl=OUT_JSONL, delay_ms=DELAY_MS, workers=WORKERS,
+               refresh_older_than: str|None = None, mode: str = EXTRACT_MODE, fixtures_dir: str|None = None,
+               lightweight: bool = LIGHTWEIGHT, runtime=None, users: List[str]|None = None,
+               on_row: Callable[[Dict], None]|None = None):
+    """`users` reemplaza a users_file y `on_row` recibe cada fila escrita (los usa ig_daemon.py)."""
+    users = read_users(users_file) if users is None else clean_users(users)
     if not users:
         print(f"⚠️ {users_file} vacío o no encontrado.")
         return
 
-    Path(USER_DATA).mkdir(parents=True, exist_ok=True)
+    # saltea lo ya scrapeado (o lo reciente, con --refresh-older-than)
+    index = ResumeIndex(out_csv, out_jsonl)
+    max_age = parse_age(refresh_older_than) if refresh_older_than else None
+    todo = [u for u in users if not index.is_fresh(u, max_age)]
+    stale = {u.lower() for u in todo if u.lower() in index.ts}   # ya tienen fila: se reemplaza
+    started = int(time.time())
+    if len(todo) < len(users):
+        print(f"↩️ {len(users) - len(todo)} perfiles ya en {out_csv}; quedan {len(todo)}")
+    users = todo
+    if not users:
+        index.close()
+        print("✅ Nada pendiente.")
+        return
 
     # preparar CSV
     new_file = not Path(out_csv).exists()
@@ -272,44 +526,57 @@ async def main(users_file=USERS_FILE, out_csv=OUT_CSV, out_jsonl=OUT_JSONL, dela
         w.writerow(["username","profile_url","emails","website","facebook_links","whatsapp_links","mailto_links","tel_links","links_all","bio","ts"])
 
     jsonl_f = open(out_jsonl, "a", encoding="utf-8") if out_jsonl else None
+    out = OrderedRowWriter(w, csv_f, jsonl_f, index, on_row)
+
+    jobs: asyncio.Queue = asyncio.Queue()
+    for i, user in enumerate(users):
+        jobs.put_nowait((i, user))
+    workers = max(1, min(workers, len(users)))
 
-    async with async_playwright() as pw:
-        ctx = await pw.chromium.launch_persistent_context(
-            USER_DATA, headless=False,
+    async with context_scope(
+            runtime, USER_DATA,
             viewport={"width": 1280, "height": 900},
             user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                         "AppleWebKit/537.36 (KHTML, like Gecko) "
                         "Chrome/124.0 Safari/537.36")
-        )
-        page = await ctx.new_page()
-
-        for i, user in enumerate(users, 1):
-            try:
-                print(f"[{i}/{len(users)}] @{user}…")
-                data = await scrape_profile_contacts(page, user)
-                write_csv_row(w, data)
-                csv_f.flush()
-                if jsonl_f:
-                    jsonl_f.write(json.dumps(data, ensure_ascii=False) + "\n")
-                    jsonl_f.flush()
-                print(f"  ✓ emails={len(data['emails'])} links={len(data['links_all'])} website={data['website'] or '-'}")
-            except Exception as e:
-                print(f"  ⚠️ error @{user}: {e}")
-            await asyncio.sleep(delay_ms/1000.0)
-
-        await ctx.close()
+    ) as ctx:
+        rf = await ResourceFilter(lightweight).install(ctx)
+        t0 = time.time()
+        await asyncio.gather(*(profile_worker(n, ctx, jobs, out, len(users), delay_ms, mode, fixtures_dir)
+                               for n in range(1, workers + 1)))
+        print(f"⏱️ {len(users)} perfiles en {time.time() - t0:.1f}s con {workers} workers")
+        total = sum(out.sources.values())
+        if total:
+            print(f"📡 Extracción: red {out.sources['network']} · HTML {out.sources['html']} "
+                  f"({out.sources['html'] / total * 100:.0f}% por fallback a HTML)")
+        rf.report("IGC", units=len(users))
 
     csv_f.close()
     if jsonl_f: jsonl_f.close()
+    index.close()
+    refreshed = stale & out.written
+    if refreshed:
+        n = drop_stale_rows(out_csv, out_jsonl, refreshed, started)
+        print(f"🧹 {len(refreshed)} perfiles actualizados: {n} filas viejas reemplazadas")
     print(f"✅ Terminado. CSV: {out_csv}" + (f" · JSONL: {out_jsonl}" if out_jsonl else ""))
 
 if __name__ == "__main__":
-    import argparse
     p = argparse.ArgumentParser(description="Instagram contact finder desde users.txt (con modal y linkshim)")
     p.add_argument("--users-file", default=USERS_FILE, help="Archivo con usernames (uno por línea)")
     p.add_argument("--out", dest="out_csv", default=OUT_CSV, help="CSV de salida")
     p.add_argument("--jsonl", dest="out_jsonl", default=OUT_JSONL, help="Ruta JSONL opcional con datos crudos")
-    p.add_argument("--delay-ms", type=int, default=DELAY_MS, help="Delay entre perfiles")
+    p.add_argument("--delay-ms", type=int, default=DELAY_MS, help="Delay entre perfiles (por worker)")
+    p.add_argument("--workers", type=int, default=WORKERS, help="Páginas en paralelo")
+    p.add_argument("--refresh-older-than", type=age_arg, default=None, help="Re-scrapea perfiles cuyo registro sea más viejo que esto (p.ej. 30d, 12h)")
+    p.add_argument("--extract", dest="mode", default=EXTRACT_MODE, choices=["network", "html"],
+                   help="network: JSON del perfil interceptado (fallback a HTML) · html: page.content() + regex")
+    p.add_argument("--no-lightweight", dest="lightweight", action="store_false", help="No bloquear imágenes/video/fuentes")
+    p.add_argument("--save-fixtures", default=None, help="Carpeta donde guardar HTML/JSON de cada perfil (para el benchmark)")
+    p.add_argument("--headless", action="store_true", help="Navegador compartido sin ventana, con la sesión guardada de ig_profile (ver ig_runtime.py)")
     args = p.parse_args()
 
-    asyncio.run(main(args.users_file, args.out_csv, args.out_jsonl, args.delay_ms))
+    async def cli():
+        async with runtime_scope(args.headless) as rt:
+            await main(args.users_file, args.out_csv, args.out_jsonl, args.delay_ms, args.workers, args.refresh_older_than,
+                       args.mode, args.save_fixtures, args.lightweight, runtime=rt)
+    asyncio.run(cli())
@@ -3,26 +3,40 @@
 # crea:
 #   - not_following_back_{user}.csv  -> A quienes sigues y NO te siguen
 #   - fans_you_dont_follow_{user}.csv -> Quienes te siguen y vos NO sigues
+#   - follow_graph.sqlite              -> grafo de aristas (ver ig_graph_store.py)
 #
 # Uso:
 #   python ig_user_network_fixed.py --user "instagram" --max 0 --delay-ms 300
+#   python ig_user_network_fixed.py --users-file seeds.txt --concurrency 3
 #
 # Requisitos:
 #   pip install playwright
 #   python -m playwright install chromium
 
-import asyncio, csv, re, time, random
+import asyncio, csv, heapq, json, re, time, random, shutil, sys
 from pathlib import Path
-from typing import List, Set, Tuple
-from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+from typing import Callable, Iterable, Iterator, List, Set, Tuple
+from playwright.async_api import TimeoutError as PWTimeout
+from ig_graph_store import GraphStore, GRAPH_DB
+from ig_lightweight import ResourceFilter
+from ig_runtime import context_scope, login_wall, runtime_scope
 
 # ----------------- Config por defecto -----------------
 TARGET_USER   = "instagram"     # <-- cambia o usa --user
-DELAY_MS      = 350             # pausa entre scrolleos (ms)
+DELAY_MS      = 350             # red quieta (ms) antes de volver a scrollear
 MAX_FETCH     = 0               # 0 = sin límite
 USER_DATA     = "./ig_profile"  # sesión persistente (cookies)
-STABLE_LIMIT  = 16              # iteraciones sin crecer para cortar
+STABLE_LIMIT  = 16              # iteraciones sin crecer para cortar (red de seguridad)
+END_CONFIRM   = 3               # ticks al fondo, sin filas ni altura nueva, para dar por terminada la lista
+SETTLE_MAX_MS = 4000            # espera máxima por tick (cargas lentas)
+WAIT_SLICE_MS = 120             # granularidad de la espera adaptativa
 OPEN_TIMEOUT  = 45000
+CHECKPOINT_DIR = "./ig_checkpoints" # usernames volcados a disco durante el crawl (--resume)
+MEM_BUDGET_MB = 64              # memoria para ordenar/diffear listas en disco
+KNOWN_RUN     = 50              # --incremental: racha de usernames ya conocidos para dejar de scrollear
+CONCURRENCY   = 2               # --users-file: usuarios crawleados a la vez
+MAX_PAGES_PER_SESSION = 6       # tope de páginas simultáneas en la sesión persistente
+LIGHTWEIGHT   = True            # bloquea imágenes/video/fuentes (ver ig_lightweight.py)
 
 FOLLOWERS_BTN_SEL  = 'a[href$="/followers/"]'
 FOLLOWING_BTN_SEL  = 'a[href$="/following/"]'
@@ -34,8 +48,7 @@ def rand(a,b):
 # ----------------- Helpers sesión / navegación -----------------
 async def ensure_login(page):
     if "login" in page.url or "/accounts/login" in page.url:
-        print("➡️ Inicia sesión en la ventana y presiona ENTER aquí…")
-        input()
+        await login_wall(page)
 
 async def goto_profile(page, user: str):
     url = f"https://www.instagram.com/{user.strip('/')}/"
@@ -81,6 +94,7 @@ async def open_list_dialog(page, which: str, user: str):
 
 # ----------------- Extracción dentro del modal -----------------
 USER_RE = re.compile(r"^/([A-Za-z0-9._]+)/$")
+NON_USER_PATHS = ("explore","p","reel","tv","accounts","policies")
 
 def username_from_href(href: str) -> str|None:
     if not href:
@@ -91,7 +105,7 @@ def username_from_href(href: str) -> str|None:
         return None
     u = m.group(1)
     # evita rutas no-usuario
-    if u in ("explore","p","reel","tv","accounts","policies"):
+    if u in NON_USER_PATHS:
         return None
     return u
 
@@ -109,6 +123,68 @@ async def extract_user_batch_from_dialog(dlg) -> List[str]:
             out.append(u)
     return out
 
+# Colector incremental: mismo filtro que username_from_href, pero dentro de la
+# página. En la primera llamada recorre lo ya renderizado e instala un
+# MutationObserver que va encolando las filas nuevas que monta la lista
+# virtualizada; cada llamada posterior solo vacía ese buffer.
+DRAIN_NEW_FN = r"""
+(root, skip) => {
+  let c = root.__igCollector;
+  if (!c) {
+    c = root.__igCollector = { seen: new Set(), buf: [] };
+    const re = /^\/([A-Za-z0-9._]+)\/$/;
+    const take = (a) => {
+      const m = re.exec((a.getAttribute('href') || '').split('?')[0]);
+      if (!m || skip.includes(m[1]) || c.seen.has(m[1])) return;
+      c.seen.add(m[1]);
+      c.buf.push(m[1]);
+    };
+    const scan = (node) => {
+      if (node.nodeType !== 1) return;
+      if (node.matches('a[href^="/"]')) take(node);
+      for (const a of node.querySelectorAll('a[href^="/"]')) take(a);
+    };
+    scan(root);
+    c.observer = new MutationObserver((muts) => {
+      for (const mu of muts) {
+        if (mu.type === 'attributes') scan(mu.target);
+        else for (const n of mu.addedNodes) scan(n);
+      }
+    });
+    // attributes: la virtualización a veces recicla nodos cambiando el href
+    c.observer.observe(root, { childList: true, subtree: true, attributes: true, attributeFilter: ['href'] });
+  }
+  const out = c.buf;
+  c.buf = [];
+  return out;
+}
+"""
+
+STOP_COLLECTOR_FN = """
+(root) => {
+  const c = root.__igCollector;
+  if (c && c.observer) c.observer.disconnect();
+  delete root.__igCollector;
+}
+"""
+
+async def stop_collector(dlg):
+    try:
+        await dlg.evaluate(STOP_COLLECTOR_FN)
+    except:
+        pass
+
+async def extract_new_users_from_dialog(dlg) -> List[str]:
+    """
+    Vacía el colector incremental del dialog (lo instala en la primera llamada).
+    Cada tick cruza el puente solo con las filas renderizadas desde el anterior.
+    """
+    try:
+        return await dlg.evaluate(DRAIN_NEW_FN, list(NON_USER_PATHS))
+    except:
+        # respaldo: extracción anchor por anchor (el caller deduplica)
+        return await extract_user_batch_from_dialog(dlg)
+
 SCROLL_FN = """
 (root) => {
   // Encuentra el contenedor realmente scrolleable dentro del dialog.
@@ -148,44 +224,161 @@ async def scroll_dialog_once(dlg):
             pass
         return {"top": 0, "height": 0, "moved": True}
 
-async def scroll_dialog_to_end(dlg, max_items:int=0, delay_ms:int=DELAY_MS) -> List[str]:
+# ----------------- Ritmo adaptativo -----------------
+# Resuelve en cuanto el colector tiene filas nuevas (sin drenarlas) o al vencer ms.
+WAIT_ROWS_FN = """
+(root, ms) => new Promise((resolve) => {
+  const c = root.__igCollector;
+  const t0 = performance.now();
+  const tick = () => {
+    if (c && c.buf.length) return resolve(true);
+    if (performance.now() - t0 >= ms) return resolve(false);
+    setTimeout(tick, 25);
+  };
+  tick();
+})
+"""
+
+class NetActivity:
+    """Cuenta requests XHR/fetch en vuelo de la página para saber cuándo la red quedó quieta."""
+
+    def __init__(self, page):
+        self.page = page
+        self.inflight = 0
+        self.last = time.monotonic()
+
+    def _on_request(self, req):
+        if req.resource_type in ("xhr", "fetch"):
+            self.inflight += 1
+            self.last = time.monotonic()
+
+    def _on_done(self, req):
+        if req.resource_type in ("xhr", "fetch"):
+            self.inflight = max(0, self.inflight - 1)
+            self.last = time.monotonic()
+
+    def attach(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_done)
+        self.page.on("requestfailed", self._on_done)
+        return self
+
+    def detach(self):
+        for ev, fn in (("request", self._on_request), ("requestfinished", self._on_done), ("requestfailed", self._on_done)):
+            try:
+                self.page.remove_listener(ev, fn)
+            except:
+                pass
+
+    def idle_ms(self, since: float = 0.0) -> float:
+        """ms sin requests en vuelo, contados desde la última request o desde `since` (lo más reciente)."""
+        if self.inflight:
+            return 0.0
+        return (time.monotonic() - max(self.last, since)) * 1000.0
+
+async def wait_for_progress(dlg, net: NetActivity, quiet_ms:int, max_ms:int=SETTLE_MAX_MS) -> bool:
+    """
+    Espera tras un scroll hasta que pase lo primero de:
+      - aparecen filas nuevas en el colector (-> True),
+      - la red lleva quiet_ms sin actividad desde el scroll (-> False),
+      - se cumple max_ms (-> False).
+    La quietud se cuenta desde max(última request, scroll): si la red ya estaba
+    quieta, igual se le dan quiet_ms a la XHR que dispara el scroll.
+    """
+    t0 = time.monotonic()
+    while True:
+        left = max_ms - (time.monotonic() - t0) * 1000.0
+        if left <= 0:
+            return False
+        slice_ms = min(WAIT_SLICE_MS, left)
+        try:
+            if await dlg.evaluate(WAIT_ROWS_FN, slice_ms):
+                return True
+        except:
+            await asyncio.sleep(slice_ms/1000.0)
+        if net.idle_ms(since=t0) >= quiet_ms:
+            return False
+
+async def scroll_dialog_to_end(dlg, max_items:int=0, delay_ms:int=DELAY_MS, stats:dict|None=None,
+                               seed:Iterable[str]=(), on_new:Callable[[List[str]], None]|None=None,
+                               stop_when:Callable[[List[str]], bool]|None=None) -> Set[str]:
     """
     Scrollea el modal mientras:
       - sigan apareciendo nuevos usernames (crecimiento),
       - y no se alcance max_items (si > 0).
-    Se corta si STABLE_LIMIT ciclos seguidos no agregan usuarios.
+    Tras cada scroll no duerme un tiempo fijo: espera filas nuevas o red quieta
+    (delay_ms). Se corta cuando el contenedor deja de moverse y ni la altura ni
+    las filas crecen durante END_CONFIRM ticks, o tras STABLE_LIMIT ticks sin crecer.
+    Cada tick solo drena del colector las filas nuevas (no re-lee la lista).
+    Si se pasa `stats`, se completa con elapsed_s, idle_s, ticks y reason.
+    `seed` son usernames ya conocidos (p.ej. de un checkpoint) y `on_new` recibe,
+    en orden del dialog, cada tanda de usernames nuevos apenas se descubre.
+    `stop_when` recibe las mismas tandas y corta el scroll si devuelve True.
+    Devuelve el set de usernames vistos (sin copiarlo ni ordenarlo: la lista
+    ordenada sale del checkpoint en disco).
     """
-    seen: Set[str] = set()
+    seen: Set[str] = set(seed)
     stable = 0
-    last_len = -1
-
-    while True:
-        # 1) Toma snapshot actual
-        batch = await extract_user_batch_from_dialog(dlg)
-        for u in batch:
-            seen.add(u)
-
-        # 2) Tope
-        if max_items and len(seen) >= max_items:
-            seen = set(list(seen)[:max_items])
-            break
-
-        # 3) ¿hubo progreso?
-        cur_len = len(seen)
-        if cur_len == last_len:
-            stable += 1
-        else:
-            stable = 0
-            last_len = cur_len
-
-        if stable >= STABLE_LIMIT:
-            break
+    at_end = 0
+    last_height = -1
+    ticks = 0
+    idle_s = 0.0
+    reason = "max"
+    t_start = time.monotonic()
+    net = NetActivity(dlg.page).attach()
 
-        # 4) Avanza el scroll
-        await scroll_dialog_once(dlg)
-        await asyncio.sleep(delay_ms/1000.0)
-
-    return sorted(seen)
+    try:
+        while True:
+            # 1) Drena solo lo nuevo desde el tick anterior
+            batch = await extract_new_users_from_dialog(dlg)
+            fresh = [u for u in batch if u not in seen]
+            if max_items:
+                fresh = fresh[:max(0, max_items - len(seen))]
+            seen.update(fresh)
+            if fresh and on_new:
+                on_new(fresh)
+            if fresh and stop_when and stop_when(fresh):
+                reason = "known"
+                break
+
+            # 2) Tope
+            if max_items and len(seen) >= max_items:
+                break
+
+            # 3) ¿hubo progreso? (filas nuevas en el dialog, aunque ya estuvieran en seed)
+            if batch:
+                stable = 0
+            else:
+                stable += 1
+
+            if stable >= STABLE_LIMIT:
+                reason = "stable"
+                break
+            if at_end >= END_CONFIRM:
+                reason = "end"
+                break
+
+            # 4) Avanza el scroll y espera progreso real (no un sleep fijo)
+            pos = await scroll_dialog_once(dlg)
+            ticks += 1
+            t_wait = time.monotonic()
+            got_rows = await wait_for_progress(dlg, net, delay_ms)
+            if not got_rows:
+                idle_s += time.monotonic() - t_wait
+
+            # 5) Fin real: el contenedor no se movió y no creció nada
+            height = pos.get("height", 0)
+            if not pos.get("moved", True) and not got_rows and height == last_height:
+                at_end += 1
+            else:
+                at_end = 0
+            last_height = height
+    finally:
+        net.detach()
+        await stop_collector(dlg)
+    if stats is not None:
+        stats.update(elapsed_s=time.monotonic() - t_start, idle_s=idle_s, ticks=ticks, reason=reason)
+    return seen
 
 async def close_dialog(page):
     dlg = page.locator(DIALOG_SEL).first
@@ -199,8 +392,123 @@ async def close_dialog(page):
         pass
     await asyncio.sleep(rand(0.12,0.25))
 
+# ----------------- Checkpoints -----------------
+class CrawlCheckpoint:
+    """
+    Progreso en disco de un crawl: {root}/{user}/followers.txt y following.txt
+    (un username por línea, en orden de descubrimiento) + state.json con los
+    pasos ya completados. Sin resume se empieza de cero.
+    """
+
+    def __init__(self, root: str, user: str, resume: bool = False):
+        self.dir = Path(root) / user
+        if not resume and self.dir.exists():
+            shutil.rmtree(self.dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.dir / "state.json"
+        self.state = json.loads(self.state_path.read_text(encoding="utf-8")) if self.state_path.exists() else {}
+
+    def list_path(self, which: str) -> Path:
+        return self.dir / f"{which}.txt"
+
+    def load(self, which: str) -> List[str]:
+        p = self.list_path(which)
+        if not p.exists():
+            return []
+        out, seen = [], set()
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                u = line.strip()
+                if u and u not in seen:
+                    seen.add(u)
+                    out.append(u)
+        return out
+
+    def appender(self, which: str):
+        """Devuelve (append, close): append(users) escribe y hace flush de inmediato."""
+        f = open(self.list_path(which), "a", encoding="utf-8")
+        def append(users: List[str]):
+            f.write("".join(u + "\n" for u in users))
+            f.flush()
+        return append, f.close
+
+    def is_done(self, step: str) -> bool:
+        return bool(self.state.get(step))
+
+    def mark_done(self, step: str):
+        self.put(step, int(time.time()))
+
+    def get(self, key: str, default=None):
+        return self.state.get(key, default)
+
+    def put(self, key: str, value):
+        self.state[key] = value
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+# ----------------- Diff en disco -----------------
+def iter_lines(path: Path) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            u = line.rstrip("\n")
+            if u:
+                yield u
+
+def _write_lines(path: Path, lines: Iterable[str]) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for u in lines:
+            f.write(u + "\n")
+            n += 1
+    return n
+
+def _dedup_sorted(it: Iterable[str]) -> Iterator[str]:
+    last = None
+    for u in it:
+        if u != last:
+            yield u
+            last = u
+
+def external_sort(src: Path, dst: Path, budget_mb:int=MEM_BUDGET_MB, exclude:str|None=None) -> int:
+    """
+    Ordena y deduplica un archivo de usernames (uno por línea) sin pasar de
+    ~budget_mb en memoria: corta en runs ordenados a disco y los une con heapq.merge.
+    `exclude` (en minúsculas) se descarta al leer. Devuelve cuántos quedaron.
+    """
+    budget = max(1, budget_mb) * 1024 * 1024
+    runs: List[Path] = []
+    chunk: List[str] = []
+    size = 0
+    try:
+        for u in (iter_lines(src) if src.exists() else ()):
+            if exclude and u.lower() == exclude:
+                continue
+            chunk.append(u)
+            size += sys.getsizeof(u) + 8
+            if size >= budget:
+                runs.append(dst.with_name(f"{dst.stem}.run{len(runs)}.txt"))
+                _write_lines(runs[-1], _dedup_sorted(sorted(chunk)))
+                chunk, size = [], 0
+        chunk.sort()
+        streams = [iter_lines(r) for r in runs] + [iter(chunk)]
+        return _write_lines(dst, _dedup_sorted(heapq.merge(*streams)))
+    finally:
+        for r in runs:
+            r.unlink(missing_ok=True)
+
+def sorted_difference(a: Iterable[str], b: Iterable[str]) -> Iterator[str]:
+    """a - b para dos streams ordenados y sin duplicados (merge en una pasada)."""
+    b = iter(b)
+    cur = next(b, None)
+    for u in a:
+        while cur is not None and cur < u:
+            cur = next(b, None)
+        if cur != u:
+            yield u
+
 # ----------------- CSV -----------------
-def write_csv(path: Path, rows: List[Tuple[str]]):
+def write_csv(path: Path, rows: Iterable[Tuple[str]]):
     new_file = not path.exists()
     with open(path, "a", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
@@ -210,20 +518,9 @@ def write_csv(path: Path, rows: List[Tuple[str]]):
         for (u,) in rows:
             w.writerow([u, f"https://www.instagram.com/{u}/", ts])
 
-def write_graph_csv(path: Path, followers: List[str], following: List[str]):
-    new_file = not path.exists()
-    with open(path, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if new_file:
-            w.writerow(["username","type","profile_url","ts"])
-        ts = int(time.time())
-        for u in followers:
-            w.writerow([u, "follower", f"https://www.instagram.com/{u}/", ts])
-        for u in following:
-            w.writerow([u, "following", f"https://www.instagram.com/{u}/", ts])
-
-def write_simple_list_csv(path: Path, users: List[str]):
+def write_simple_list_csv(path: Path, users: Iterable[str]) -> int:
     new_file = not path.exists()
+    n = 0
     with open(path, "a", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         if new_file:
@@ -231,83 +528,353 @@ def write_simple_list_csv(path: Path, users: List[str]):
         ts = int(time.time())
         for u in users:
             w.writerow([u, f"https://www.instagram.com/{u}/", ts])
+            n += 1
+    return n
 
 # ----------------- Flujo principal -----------------
-async def scrape_follow_list(page, user: str, which: str, max_items:int, delay_ms:int) -> List[str]:
+def count_without_owner(users: Set[str]|List[str], user: str) -> int:
+    # descuenta al dueño (a veces aparece al tope) sin copiar la lista
+    return len(users) - sum(1 for u in {user, user.lower()} if u in users)
+
+class KnownRunStop:
+    """
+    stop_when para scroll_dialog_to_end en modo incremental: corta tras `run_len`
+    usernames seguidos (en orden del dialog) que ya están en la lista vigente del
+    grafo. Lleva `horizon`: la mayor posición previa alcanzada en el recorrido,
+    y `fired`: si el corte fue por la racha (si no, lo recorrido es la lista entera).
+    """
+
+    def __init__(self, store: GraphStore, owner: str, which: str, run_len:int=KNOWN_RUN):
+        self.store, self.owner, self.which, self.run_len = store, owner, which, run_len
+        self.run = 0
+        self.horizon = -1
+        self.fired = False
+
+    def __call__(self, fresh: List[str]) -> bool:
+        known = self.store.known_positions(self.owner, self.which, fresh)
+        hit = False
+        for u in fresh:
+            if u.lower() == self.owner.lower():
+                continue
+            if u in known:
+                self.run += 1
+                self.horizon = max(self.horizon, known[u])
+                hit = hit or self.run >= self.run_len
+            else:
+                self.run = 0
+        self.fired = self.fired or hit
+        return hit
+
+async def scrape_follow_list(page, user: str, which: str, max_items:int, delay_ms:int,
+                             checkpoint: CrawlCheckpoint|None=None,
+                             stop_when:Callable[[List[str]], bool]|None=None,
+                             on_user:Callable[[str, str], None]|None=None) -> int:
+    """
+    Devuelve cuántos usernames tiene la lista (sin el dueño); los usernames quedan
+    en el checkpoint. `on_user(which, username)` recibe cada username nuevo apenas
+    aparece (p.ej. ig_daemon.py).
+    """
+    seed, append, close = [], None, None
+    if checkpoint:
+        seed = checkpoint.load(which)
+        if seed:
+            print(f"↩️ {which}: {len(seed)} usernames retomados del checkpoint")
+            if stop_when and stop_when(seed):
+                return count_without_owner(seed, user)
+        append, close = checkpoint.appender(which)
+    on_new = append
+    if on_user:
+        def on_new(batch: List[str]):
+            if append:
+                append(batch)
+            for u in batch:
+                if u.lower() != user.lower():
+                    on_user(which, u)
     dlg = await open_list_dialog(page, which, user)
+    stats: dict = {}
     try:
-        users = await scroll_dialog_to_end(dlg, max_items=max_items, delay_ms=delay_ms)
+        users = await scroll_dialog_to_end(dlg, max_items=max_items, delay_ms=delay_ms, stats=stats,
+                                           seed=seed, on_new=on_new, stop_when=stop_when)
     finally:
         await close_dialog(page)
-    # quita al dueño (a veces aparece al tope)
-    users = [u for u in users if u.lower() != user.lower()]
-    return users
-
-async def main(user: str, delay_ms:int=DELAY_MS, max_items:int=MAX_FETCH, user_data:str=USER_DATA):
-    Path(user_data).mkdir(parents=True, exist_ok=True)
-
-    async with async_playwright() as pw:
-        ctx = await pw.chromium.launch_persistent_context(
-            user_data,
-            headless=False,
-            viewport={"width": 1280, "height": 900},
-            user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/124.0 Safari/537.36")
-        )
-        page = await ctx.new_page()
-
-        await goto_profile(page, user)
-
-        print(f"▶️ Perfil: @{user} — capturando FOLLOWERS…")
-        followers = await scrape_follow_list(page, user, "followers", max_items, delay_ms)
-        print(f"✅ Followers capturados: {len(followers)}")
-
-        print(f"▶️ Perfil: @{user} — capturando FOLLOWING…")
-        following = await scrape_follow_list(page, user, "following", max_items, delay_ms)
-        print(f"✅ Following capturados: {len(following)}")
-
-        # Set para comparaciones O(1)
-        followers_set: Set[str] = set(followers)
-        following_set: Set[str] = set(following)
-
-        # 1) A quienes sigues y NO te siguen (not_following_back)
-        not_following_back = sorted(list(following_set - followers_set))
-
-        # 2) Quienes te siguen y vos NO sigues (fans_you_dont_follow)
-        fans_you_dont_follow = sorted(list(followers_set - following_set))
-
-        print(f"⚠️ No te siguen de vuelta: {len(not_following_back)}")
-        print(f"⭐ Te siguen y no los sigues: {len(fans_you_dont_follow)}")
-
-        followers_path = Path(f"followers_{user}.csv")
-        following_path = Path(f"following_{user}.csv")
-        graph_path     = Path(f"follow_graph_{user}.csv")
-        not_back_path  = Path(f"not_following_back_{user}.csv")
-        fans_path      = Path(f"fans_you_dont_follow_{user}.csv")
-
-        write_csv(followers_path, [(u,) for u in followers])
-        write_csv(following_path, [(u,) for u in following])
-        write_graph_csv(graph_path, followers, following)
-        write_simple_list_csv(not_back_path, not_following_back)
-        write_simple_list_csv(fans_path, fans_you_dont_follow)
-
-        print("💾 Guardados:")
+        if close:
+            close()
+    if stats:
+        print(f"⏱️ {which}: {stats['elapsed_s']:.1f}s (idle {stats['idle_s']:.1f}s, "
+              f"{stats['ticks']} ticks, corte: {stats['reason']})")
+    return count_without_owner(users, user)
+
+async def crawl_user(ctx, user: str, delay_ms:int=DELAY_MS, max_items:int=MAX_FETCH,
+                     resume:bool=False, checkpoint_dir:str=CHECKPOINT_DIR, mem_budget_mb:int=MEM_BUDGET_MB,
+                     graph_db:str=GRAPH_DB, incremental:bool=False, known_run:int=KNOWN_RUN,
+                     parallel_lists:bool=True, on_user:Callable[[str, str], None]|None=None, out_dir:str="."):
+    """
+    Crawl completo de un usuario en el contexto `ctx`. Con parallel_lists,
+    followers y following se capturan a la vez en dos páginas; los diffs
+    arrancan apenas terminan ambas. Los CSV van a `out_dir`. Devuelve cuántos
+    usernames se capturaron.
+    """
+    captured = []
+    ckpt = CrawlCheckpoint(checkpoint_dir, user, resume=resume)
+    with GraphStore(graph_db) as store:
+        lists = ("followers", "following")
+
+        # Modo por lista: incremental solo si hay snapshot previo con orden del dialog
+        modes = {}
+        for which in lists:
+            mode = ckpt.get(f"mode:{which}")
+            if not mode:
+                mode = "incremental" if incremental and store.can_incremental(user, which) else "full"
+                if incremental and mode == "full":
+                    print(f"ℹ️ {which}: sin snapshot previo en {graph_db}, crawl completo")
+                ckpt.put(f"mode:{which}", mode)
+            modes[which] = mode
+
+        async def capture(which: str, page):
+            stop = KnownRunStop(store, user, which, known_run) if modes[which] == "incremental" else None
+            print(f"▶️ Perfil: @{user} — capturando {which.upper()}…" + (" (incremental)" if stop else ""))
+            n = await scrape_follow_list(page, user, which, max_items, delay_ms, checkpoint=ckpt, stop_when=stop,
+                                         on_user=on_user)
+            if stop and stop.fired:
+                ckpt.put(f"horizon:{which}", stop.horizon)
+            elif stop:
+                # terminó por fin de lista / estable / tope: lo recorrido es un snapshot completo
+                print(f"ℹ️ {which}: no hubo racha de conocidos, se registra como crawl completo")
+                modes[which] = "full"
+                ckpt.put(f"mode:{which}", "full")
+            ckpt.mark_done(which)
+            captured.append(n)
+            print(f"✅ @{user} {which} capturados: {n}")
+
+        for which in lists:
+            if ckpt.is_done(which):
+                print(f"↩️ @{user} {which.upper()} ya completo en checkpoint")
+        pending = [w for w in lists if not ckpt.is_done(w)]
+        if parallel_lists and len(pending) > 1:
+            # una página (y un dialog) por lista, en el mismo contexto y a la vez
+            pages = [await ctx.new_page() for _ in pending]
+            async def open_and_capture(which: str, page):
+                await goto_profile(page, user)
+                await capture(which, page)
+            tasks = [asyncio.create_task(open_and_capture(w, pg)) for w, pg in zip(pending, pages)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # si una lista falla, la otra se cancela antes de cerrar su página: no sigue
+                # scrolleando ni escribe en el checkpoint de un crawl ya dado por fallido
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for pg in pages:
+                    await pg.close()
+        elif pending:
+            page = await ctx.new_page()
+            try:
+                await goto_profile(page, user)
+                for which in pending:
+                    await capture(which, page)
+            finally:
+                await page.close()
+
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        followers_path = out / f"followers_{user}.csv"
+        following_path = out / f"following_{user}.csv"
+        not_back_path  = out / f"not_following_back_{user}.csv"
+        fans_path      = out / f"fans_you_dont_follow_{user}.csv"
+        sorted_paths   = {which: ckpt.dir / f"{which}.sorted.txt" for which in lists}
+        followers = lambda: iter_lines(sorted_paths["followers"])
+        following = lambda: iter_lines(sorted_paths["following"])
+
+        def write_graph():
+            for which in lists:
+                # el checkpoint conserva el orden del dialog (-> pos en el grafo)
+                scanned = (u for u in iter_lines(ckpt.list_path(which)) if u.lower() != user.lower())
+                if modes[which] == "incremental":
+                    store.record_incremental(user, which, scanned, ckpt.get(f"horizon:{which}", -1))
+                else:
+                    store.record_crawl(user, which, scanned)
+                added, removed = store.changes_since_last(user, which)
+                print(f"🔁 {which}: +{len(added)} / -{len(removed)} desde el crawl anterior")
+                if incremental:
+                    write_simple_list_csv(out / f"added_{which}_{user}.csv", added)
+                    write_simple_list_csv(out / f"removed_{which}_{user}.csv", removed)
+
+        def build_sorted():
+            # Listas ordenadas en disco con memoria acotada: en modo completo salen
+            # del checkpoint; en incremental, de la lista vigente del grafo.
+            for which in lists:
+                if modes[which] == "incremental":
+                    _write_lines(sorted_paths[which], store.iter_current(user, which))
+                else:
+                    external_sort(ckpt.list_path(which), sorted_paths[which], mem_budget_mb, exclude=user.lower())
+
+        def write_not_back():
+            # 1) A quienes sigues y NO te siguen (not_following_back)
+            n = write_simple_list_csv(not_back_path, sorted_difference(following(), followers()))
+            print(f"⚠️ No te siguen de vuelta: {n}")
+
+        def write_fans():
+            # 2) Quienes te siguen y vos NO sigues (fans_you_dont_follow)
+            n = write_simple_list_csv(fans_path, sorted_difference(followers(), following()))
+            print(f"⭐ Te siguen y no los sigues: {n}")
+
+        # cada salida se marca en el checkpoint: --resume no la repite; los diffs
+        # salen de un merge en streaming sobre las listas ordenadas en disco
+        outputs = [
+            ("out:graph",     write_graph),
+            ("out:sorted",    build_sorted),
+            ("out:followers", lambda: write_csv(followers_path, ((u,) for u in followers()))),
+            ("out:following", lambda: write_csv(following_path, ((u,) for u in following()))),
+            ("out:not_back",  write_not_back),
+            ("out:fans",      write_fans),
+        ]
+        for step, write in outputs:
+            if ckpt.is_done(step):
+                continue
+            write()
+            ckpt.mark_done(step)
+
+        print(f"💾 Guardados (@{user}):")
         print(f" - {followers_path}")
         print(f" - {following_path}")
-        print(f" - {graph_path}")
+        print(f" - {graph_db}   (grafo: @{user} followers/following)")
         print(f" - {not_back_path}   (Sigues → NO te siguen)")
         print(f" - {fans_path}       (Te siguen → NO los sigues)")
+        if incremental:
+            print(f" - {out / f'added_*_{user}.csv'} / removed_*_{user}.csv   (cambios desde el crawl anterior)")
+    return sum(captured)
+
+async def main(user: str, delay_ms:int=DELAY_MS, max_items:int=MAX_FETCH, user_data:str=USER_DATA,
+               resume:bool=False, checkpoint_dir:str=CHECKPOINT_DIR, mem_budget_mb:int=MEM_BUDGET_MB,
+               graph_db:str=GRAPH_DB, incremental:bool=False, known_run:int=KNOWN_RUN,
+               parallel_lists:bool=True, lightweight:bool=LIGHTWEIGHT, runtime=None,
+               on_user:Callable[[str, str], None]|None=None, out_dir:str="."):
+    async with context_scope(runtime, user_data) as ctx:
+        rf = await ResourceFilter(lightweight).install(ctx)
+        n = await crawl_user(ctx, user, delay_ms, max_items, resume, checkpoint_dir, mem_budget_mb,
+                             graph_db, incremental, known_run, parallel_lists, on_user, out_dir)
+        rf.report("IGFollowersFollowing", units=n)
+
+# ----------------- Lote de usuarios -----------------
+class CrawlQueue:
+    """
+    Cola persistente del modo --users-file: {username: pending|running|done|failed}
+    en un JSON. Lo que quedó 'running' tras un corte se retoma con su checkpoint.
+    Solo cuentan los usuarios del archivo actual; si el lote anterior de esos
+    usuarios ya había terminado (todos done/failed), arranca un lote nuevo.
+    """
 
-        await ctx.close()
+    def __init__(self, path: Path, users: Iterable[str]):
+        self.path = path
+        self.users = list(dict.fromkeys(users))
+        self.status = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        self.interrupted = {u for u in self.users if self.status.get(u) == "running"}
+        finished = all(self.status.get(u) in ("done", "failed") for u in self.users)
+        self.restarted = finished and bool(self.users)
+        for u in self.users:
+            if finished or self.status.get(u) in (None, "running"):
+                self.status[u] = "pending"
+        self.save()
+
+    def pending(self) -> List[str]:
+        return [u for u in self.users if self.status[u] == "pending"]
+
+    def with_status(self, status: str) -> List[str]:
+        return [u for u in self.users if self.status[u] == status]
+
+    def set(self, user: str, status: str):
+        self.status[user] = status
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.status, indent=0), encoding="utf-8")
+        tmp.replace(self.path)
+
+def read_users(path: str) -> List[str]:
+    users = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            u = line.strip().lstrip("@")
+            if u:
+                users.append(u)
+    return users
+
+async def run_batch(users_file: str, concurrency:int=CONCURRENCY, delay_ms:int=DELAY_MS, max_items:int=MAX_FETCH,
+                    user_data:str=USER_DATA, checkpoint_dir:str=CHECKPOINT_DIR, mem_budget_mb:int=MEM_BUDGET_MB,
+                    graph_db:str=GRAPH_DB, incremental:bool=False, known_run:int=KNOWN_RUN, retry_failed:bool=False,
+                    parallel_lists:bool=True, lightweight:bool=LIGHTWEIGHT, runtime=None):
+    """
+    Crawlea todos los usuarios de `users_file` con un solo contexto persistente y
+    hasta `concurrency` usuarios a la vez (páginas propias para cada uno), con
+    tope MAX_PAGES_PER_SESSION páginas. La cola sobrevive reinicios (queue.json
+    en checkpoint_dir).
+    """
+    queue = CrawlQueue(Path(checkpoint_dir) / "queue.json", read_users(users_file))
+    if retry_failed:
+        for u in queue.with_status("failed"):
+            queue.set(u, "pending")
+    if queue.restarted:
+        print(f"🔄 El lote anterior de {users_file} había terminado: empieza uno nuevo")
+    todo = queue.pending()
+    if not todo:
+        print(f"✅ Nada pendiente en {queue.path}")
+        return
+    pages_per_user = 2 if parallel_lists else 1
+    workers = max(1, min(concurrency, MAX_PAGES_PER_SESSION // pages_per_user, len(todo)))
+    print(f"▶️ Lote: {len(todo)} usuarios pendientes · {workers} en paralelo")
+
+    jobs: asyncio.Queue = asyncio.Queue()
+    for u in todo:
+        jobs.put_nowait(u)
+    captured = []
+
+    async def worker(ctx, n: int):
+        while True:
+            try:
+                u = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            queue.set(u, "running")
+            try:
+                captured.append(await crawl_user(ctx, u, delay_ms, max_items, u in queue.interrupted, checkpoint_dir,
+                                                 mem_budget_mb, graph_db, incremental, known_run, parallel_lists))
+                queue.set(u, "done")
+            except Exception as e:
+                print(f"⚠️ [w{n}] error @{u}: {e}")
+                queue.set(u, "failed")
+            await asyncio.sleep(rand(0.5, 1.5))
+
+    async with context_scope(runtime, user_data) as ctx:
+        rf = await ResourceFilter(lightweight).install(ctx)
+        await asyncio.gather(*(worker(ctx, n) for n in range(1, workers + 1)))
+        rf.report("IGFollowersFollowing", units=sum(captured))
+
+    done = len(queue.with_status("done"))
+    failed = queue.with_status("failed")
+    print(f"✅ Lote terminado: {done} ok · {len(failed)} con error" + (f" ({', '.join(failed)})" if failed else ""))
 
 if __name__ == "__main__":
     import argparse
     p = argparse.ArgumentParser()
     p.add_argument("--user", required=False, default=TARGET_USER, help="Usuario objetivo (sin @)")
-    p.add_argument("--delay-ms", type=int, default=DELAY_MS, help="Delay entre scrolleos (ms)")
+    p.add_argument("--delay-ms", type=int, default=DELAY_MS, help="Red quieta (ms) antes de volver a scrollear")
     p.add_argument("--max", type=int, default=MAX_FETCH, help="Tope por lista (0 = sin límite)")
     p.add_argument("--user-data", default=USER_DATA, help="Carpeta sesión persistente")
+    p.add_argument("--resume", action="store_true", help="Retoma desde el checkpoint de una corrida interrumpida")
+    p.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Carpeta de checkpoints")
+    p.add_argument("--graph-db", default=GRAPH_DB, help="Base SQLite del grafo de seguidores")
+    p.add_argument("--incremental", action="store_true", help="Usa el snapshot previo del grafo: emite solo altas/bajas y corta al llegar a usuarios ya conocidos")
+    p.add_argument("--known-run", type=int, default=KNOWN_RUN, help="Racha de usuarios conocidos para cortar en --incremental")
+    p.add_argument("--users-file", help="Modo lote: archivo con usernames (uno por línea)")
+    p.add_argument("--concurrency", type=int, default=CONCURRENCY, help=f"Usuarios en paralelo en modo lote (tope {MAX_PAGES_PER_SESSION} páginas)")
+    p.add_argument("--retry-failed", action="store_true", help="Modo lote: reintenta los usuarios marcados como fallidos")
+    p.add_argument("--serial-lists", action="store_true", help="Captura followers y following uno tras otro en una sola página")
+    p.add_argument("--no-lightweight", dest="lightweight", action="store_false", help="No bloquear imágenes/video/fuentes")
+    p.add_argument("--mem-budget-mb", type=int, default=MEM_BUDGET_MB, help="Memoria máx. para ordenar/diffear listas (MB)")
+    p.add_argument("--headless", action="store_true", help="Navegador compartido sin ventana, con la sesión guardada de ig_profile (ver ig_runtime.py)")
     args = p.parse_args()
 
     TARGET_USER = args.user
@@ -315,4 +882,14 @@ if __name__ == "__main__":
     MAX_FETCH   = args.max
     USER_DATA   = args.user_data
 
-    asyncio.run(main(TARGET_USER, DELAY_MS, MAX_FETCH, USER_DATA))
+    async def cli():
+        async with runtime_scope(args.headless, USER_DATA) as rt:
+            if args.users_file:
+                await run_batch(args.users_file, args.concurrency, DELAY_MS, MAX_FETCH, USER_DATA, args.checkpoint_dir,
+                                args.mem_budget_mb, args.graph_db, args.incremental, args.known_run, args.retry_failed,
+                                not args.serial_lists, args.lightweight, runtime=rt)
+            else:
+                await main(TARGET_USER, DELAY_MS, MAX_FETCH, USER_DATA, args.resume, args.checkpoint_dir, args.mem_budget_mb,
+                           args.graph_db, args.incremental, args.known_run, not args.serial_lists,
+                           args.lightweight, runtime=rt)
+    asyncio.run(cli())
@@ -1,6 +1,13 @@
-import asyncio, os, re, time, random
-from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+# InstagramHashtagCrawler2.py
+# Usuarios que publican con un hashtag → TXT (una línea instagram.com/<user>),
+# sin repetir los que ya estaban de corridas anteriores.
+# Envoltorio fino sobre ig_crawler_engine.py (HashtagSource + TxtSink).
+
+import asyncio
+from ig_crawler_engine import CrawlEngine, HashtagSource, TxtSink
+from ig_author_cache import AUTHOR_CACHE, PostAuthorCache
+from ig_runtime import runtime_scope
+from ig_seen_posts import SEEN_FILE, SeenPosts
 
 # ================== Config ==================
 HASHTAG      = "n8n"       # <-- cambia aquí o usa --hashtag
@@ -8,179 +15,21 @@ PER_CYCLE    = 6           # abrir 6 posts por ciclo
 DELAY_MS     = 300         # pausa entre posts (ms)
 MAX_USERS    = 300         # tope de usuarios (0 = sin límite)
 OUT_TXT      = "ig_users.txt"
-USER_DATA    = "./ig_profile"   # carpeta para persistir sesión (cookies)
-
-POST_SEL   = 'a[href^="/p/"], a[href^="/reel/"], a[href^="/tv/"]'
-DIALOG_SEL = 'div[role="dialog"]'
+LIGHTWEIGHT  = True             # bloquea imágenes/video/fuentes (ver ig_lightweight.py)
+MODE         = "harvest"        # harvest: hrefs del grid + autores en paralelo (ig_harvest.py) · click: modal post a post
+WORKERS      = 3                # páginas resolviendo posts en modo harvest
 # ============================================
 
-def rand(a,b): 
-    return a + random.random()*(b-a)
-
-def load_existing_users(path: str) -> set:
-    s = set()
-    p = Path(path)
-    if p.exists():
-        for line in p.read_text(encoding="utf-8").splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            m = re.search(r"instagram\.com/([A-Za-z0-9._]+)/?$", line)
-            if m:
-                s.add(m.group(1))
-    return s
-
-async def ensure_login(page):
-    # Si no estás logueado, esperá a que aparezca login y logueate manualmente.
-    if "login" in page.url or "/accounts/login" in page.url:
-        print("➡️ Inicia sesión en la ventana y luego presiona ENTER aquí…")
-        input()
-
-async def get_visible_tiles(page):
-    tiles = await page.locator(POST_SEL).element_handles()
-    vp = await page.evaluate("({w: window.innerWidth, h: window.innerHeight})")
-    visibles = []
-    for h in tiles:
-        box = await h.bounding_box()
-        if not box:
-            continue
-        if 100 <= box["y"] <= vp["h"] - 80:
-            visibles.append(h)
-    return visibles
-
-async def wait_for_grid(page, timeout=10000):
-    await page.wait_for_selector(POST_SEL, timeout=timeout)
-
-async def extract_username_from_dialog(dlg):
-    # 1) link en header: /<user>/
-    try:
-        a = dlg.locator('header a[href^="/"]:not([href*="/p/"]):not([href*="/reel/"]):not([href*="/tv/"])').first
-        href = await a.get_attribute("href")
-        if href:
-            m = re.match(r"^/([A-Za-z0-9._]+)/$", href)
-            if m:
-                return m.group(1)
-        txt = (await a.text_content() or "").strip()
-        if re.fullmatch(r"[A-Za-z0-9._]{2,}", txt):
-            return txt
-    except PWTimeout:
-        pass
-    # 2) anchors genéricos con texto de usuario
-    try:
-        anchors = await dlg.locator('a[role="link"]').all()
-        for an in anchors:
-            txt = (await an.text_content() or "").strip()
-            if re.fullmatch(r"[A-Za-z0-9._]{2,}", txt):
-                return txt
-    except:
-        pass
-    # 3) regex del HTML del modal
-    html = await dlg.inner_html()
-    m = re.search(r'"username"\s*:\s*"([A-Za-z0-9._]+)"', html)
-    if m:
-        return m.group(1)
-    m = re.search(r"instagram\.com/([A-Za-z0-9._]+)/", html)
-    if m:
-        return m.group(1)
-    return None
-
-async def click_and_grab_username(page, visited_posts:set):
-    # toma el primer post visible NO visitado
-    tiles = await get_visible_tiles(page)
-    for t in tiles:
-        href = await t.get_attribute("href")
-        if not href:
-            continue
-        url_norm = page.url.split("/explore")[0] + href.split("?")[0]
-        if url_norm in visited_posts:
-            continue
-        visited_posts.add(url_norm)
-
-        await t.scroll_into_view_if_needed()
-        await asyncio.sleep(rand(0.05,0.15))
-        await t.click()
-        try:
-            dlg = page.locator(DIALOG_SEL)
-            await dlg.wait_for(state="visible", timeout=6000)
-            user = await extract_username_from_dialog(dlg)
-        except PWTimeout:
-            user = None
-        finally:
-            # cerrar modal
-            try:
-                close_btn = dlg.locator('[aria-label="Close"], [aria-label="Cerrar"]').first
-                if await close_btn.count():
-                    await close_btn.click()
-                else:
-                    await page.keyboard.press("Escape")
-            except:
-                pass
-        await asyncio.sleep(DELAY_MS/1000.0)
-        return user
-    return None
-
-async def main(hashtag=HASHTAG, per_cycle=PER_CYCLE, delay_ms=DELAY_MS, max_users=MAX_USERS):
-    global DELAY_MS
-    DELAY_MS = delay_ms
-
-    Path(USER_DATA).mkdir(parents=True, exist_ok=True)
-    users = load_existing_users(OUT_TXT)  # pre-cargar para evitar duplicados entre corridas
-    visited = set()
-
-    async with async_playwright() as pw:
-        ctx = await pw.chromium.launch_persistent_context(
-            USER_DATA, headless=False,
-            viewport={"width": 1280, "height": 900},
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/118.0 Safari/537.36"
-        )
-        page = await ctx.new_page()
-        url = f"https://www.instagram.com/explore/tags/{hashtag.strip('#')}/"
-        await page.goto(url, wait_until="domcontentloaded")
-        await ensure_login(page)
-        await page.goto(url)
-        await wait_for_grid(page)
-
-        # archivo de salida (append)
-        out_f = open(OUT_TXT, "a", encoding="utf-8")
-
-        print(f"▶️ Empezando en #{hashtag}… (salida: {OUT_TXT})")
-        try:
-            idle_cycles = 0
-            while True:
-                # ciclo: abrir/leer/cerrar N posts
-                got_in_cycle = 0
-                for _ in range(per_cycle):
-                    user = await click_and_grab_username(page, visited)
-                    if user:
-                        if user not in users:
-                            users.add(user)
-                            out_f.write(f"instagram.com/{user}\n")
-                            out_f.flush()
-                            print(f"+ instagram.com/{user}  (total: {len(users)})")
-                        got_in_cycle += 1
-                    else:
-                        # no encontró visible → corta para scrollear
-                        break
-                # scroll y pausa
-                await page.mouse.wheel(0, 900)
-                await asyncio.sleep(rand(0.6, 1.2))
-
-                if got_in_cycle == 0:
-                    idle_cycles += 1
-                else:
-                    idle_cycles = 0
-
-                if idle_cycles >= 6:
-                    print("ℹ️ No aparecen más posts nuevos en el grid. Fin.")
-                    break
-
-                if max_users and len(users) >= max_users:
-                    print("✅ Tope de usuarios alcanzado.")
-                    break
-        finally:
-            out_f.close()
-            await ctx.close()
+async def main(hashtag=HASHTAG, per_cycle=PER_CYCLE, delay_ms=DELAY_MS, max_users=MAX_USERS, lightweight=LIGHTWEIGHT, runtime=None,
+               on_user=None, mode=MODE, workers=WORKERS, seen_file=SEEN_FILE,
+               author_cache=AUTHOR_CACHE):
+    sink = TxtSink(OUT_TXT)  # índice de usuarios existentes (ig_users.txt.uidx) para evitar duplicados entre corridas
+    print(f"📄 Salida: {OUT_TXT} ({len(sink.index)} usuarios previos)")
+    engine = CrawlEngine(HashtagSource(hashtag), [sink], mode, workers, per_cycle, delay_ms, max_users,
+                         lightweight, on_user=on_user, label="InstagramHashtagCrawler2",
+                         seen=SeenPosts.open(seen_file) if seen_file else None,
+                         cache=PostAuthorCache.open(author_cache) if author_cache else None)
+    return await engine.run(runtime)
 
 if __name__ == "__main__":
     import argparse
@@ -189,6 +38,20 @@ if __name__ == "__main__":
     p.add_argument("--per-cycle", type=int, default=PER_CYCLE)
     p.add_argument("--delay-ms", type=int, default=DELAY_MS)
     p.add_argument("--max-users", type=int, default=MAX_USERS)
+    p.add_argument("--mode", default=MODE, choices=["harvest", "click"],
+                   help="harvest: hrefs del grid + autores en páginas paralelas · click: abrir el modal de cada post")
+    p.add_argument("--workers", type=int, default=WORKERS, help="Páginas resolviendo posts (modo harvest)")
+    p.add_argument("--seen-file", default=SEEN_FILE, help="Registro de posts ya procesados (compartido entre corridas y crawlers)")
+    p.add_argument("--no-seen", dest="seen_file", action="store_const", const=None, help="No saltear posts de corridas anteriores")
+    p.add_argument("--author-cache", default=AUTHOR_CACHE, help="Caché SQLite post→autor (compartida entre corridas y crawlers)")
+    p.add_argument("--no-author-cache", dest="author_cache", action="store_const", const=None, help="Resolver siempre el autor en el navegador")
+    p.add_argument("--no-lightweight", dest="lightweight", action="store_false", help="No bloquear imágenes/video/fuentes")
+    p.add_argument("--headless", action="store_true", help="Navegador compartido sin ventana, con la sesión guardada de ig_profile (ver ig_runtime.py)")
     a = p.parse_args()
     HASHTAG, PER_CYCLE, DELAY_MS, MAX_USERS = a.hashtag, a.per_cycle, a.delay_ms, a.max_users
-    asyncio.run(main(HASHTAG, PER_CYCLE, DELAY_MS, MAX_USERS))
+
+    async def cli():
+        async with runtime_scope(a.headless) as rt:
+            await main(HASHTAG, PER_CYCLE, DELAY_MS, MAX_USERS, a.lightweight, runtime=rt, mode=a.mode, workers=a.workers,
+                       seen_file=a.seen_file, author_cache=a.author_cache)
+    asyncio.run(cli())
@@ -0,0 +1,61 @@
+# bench_profile_extraction.py
+# Compara, sobre fixtures guardados, las dos formas de sacar bio + urls de un perfil:
+#   - html:    regex (BIO_RE / URL_JSON_RE) sobre el HTML serializado completo
+#   - network: objeto de usuario desde el JSON interceptado (find_user_node)
+#
+# Generar fixtures (un <user>.html y, si se capturó, <user>.json por perfil):
+#   python IGC.py --users-file users.txt --save-fixtures fixtures/
+#
+# Uso:
+#   python bench_profile_extraction.py --fixtures fixtures/ --repeat 50
+#
+# Nota: mide solo el parseo. En vivo, el camino html además paga page.content() y
+# la espera del JSON que no llegó (hasta el evento load + NET_GRACE_MS). IGC.py
+# informa al final qué proporción de perfiles salió por red y cuál por HTML.
+
+import json, time
+from pathlib import Path
+from ig_profile_parse import profile_from_html, profile_from_payload, find_user_node
+
+def bench(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+def main(fixtures: str, repeat: int):
+    html_files = sorted(Path(fixtures).glob("*.html"))
+    if not html_files:
+        print(f"⚠️ No hay fixtures en {fixtures}")
+        return
+    tot_html = tot_net = 0.0
+    n_net = 0
+    print(f"{'usuario':<28}{'html KB':>9}{'html ms':>10}{'json ms':>10}  json⊆html")
+    for hp in html_files:
+        user = hp.stem
+        html = hp.read_text(encoding="utf-8")
+        t_html = bench(lambda: profile_from_html(html), repeat)
+        tot_html += t_html
+        jp = hp.with_suffix(".json")
+        t_net, same = None, "-"
+        if jp.exists():
+            raw = jp.read_text(encoding="utf-8")
+            # incluye json.loads: en vivo resp.json() también parsea
+            t_net = bench(lambda: profile_from_payload(find_user_node(json.loads(raw), user) or {}), repeat)
+            tot_net += t_net
+            n_net += 1
+            node = find_user_node(json.loads(raw), user) or {}
+            same = "sí" if profile_from_payload(node)[1] <= profile_from_html(html)[1] else "no"
+        print(f"{user:<28}{len(html)/1024:>9.0f}{t_html:>10.2f}"
+              f"{(f'{t_net:.2f}' if t_net is not None else '-'):>10}  {same}")
+    print(f"\nPromedio html: {tot_html/len(html_files):.2f} ms/perfil ({len(html_files)} fixtures)")
+    if n_net:
+        print(f"Promedio json: {tot_net/n_net:.2f} ms/perfil ({n_net} fixtures con JSON)")
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark extracción de perfil: regex sobre HTML vs JSON interceptado")
+    p.add_argument("--fixtures", default="fixtures", help="Carpeta con <user>.html / <user>.json")
+    p.add_argument("--repeat", type=int, default=20, help="Repeticiones por fixture")
+    a = p.parse_args()
+    main(a.fixtures, a.repeat)
@@ -0,0 +1,107 @@
+# ig_author_cache.py
+# Caché persistente post → autor (shortcode → username), compartido por los
+# crawlers de hashtag, ubicación y perfil. Se consulta ANTES de abrir un modal o
+# navegar a un post: si el autor ya se resolvió en otra corrida/crawler, no hay
+# ida y vuelta al navegador.
+#
+# - TTL: entradas más viejas que AUTHOR_TTL_DAYS cuentan como miss (y se reemplazan).
+# - LRU acotado: por encima de AUTHOR_MAX_ENTRIES se borran las menos usadas. used_at
+#   es una marca estrictamente creciente (no el segundo entero): en una ráfaga de
+#   cientos de altas por segundo igual se descartan las más viejas.
+# - Al final de la corrida se imprime hits/misses.
+#
+# Uso:
+#   cache = PostAuthorCache.open()          # ig_post_authors.sqlite
+#   user = cache.get(code) or await resolver(...)
+#   cache.put(code, user)
+#   cache.close(); print(cache.summary())
+
+import os, sqlite3, time
+from pathlib import Path
+from typing import Dict
+from ig_seen_posts import shortcode
+
+AUTHOR_CACHE       = "ig_post_authors.sqlite"
+AUTHOR_TTL_DAYS    = 90
+AUTHOR_MAX_ENTRIES = 2_000_000
+FLUSH_EVERY        = 200      # escrituras acumuladas antes de hacer commit
+
+class PostAuthorCache:
+    _shared: Dict[str, "PostAuthorCache"] = {}
+
+    def __init__(self, path: str = AUTHOR_CACHE, ttl_days: float = AUTHOR_TTL_DAYS,
+                 max_entries: int = AUTHOR_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl_s = ttl_days * 86400
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS post_authors (
+            code TEXT PRIMARY KEY, username TEXT NOT NULL,
+            resolved_at INTEGER NOT NULL, used_at INTEGER NOT NULL) WITHOUT ROWID""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS post_authors_used ON post_authors(used_at)")
+        self.hits = self.misses = self.puts = 0
+        self.touched: Dict[str, float] = {}   # hits pendientes de actualizar used_at
+        self.last_stamp = 0.0
+        self.pending = 0
+        (self.count,) = self.db.execute("SELECT COUNT(*) FROM post_authors").fetchone()   # aproximado entre podas
+
+    @classmethod
+    def open(cls, path: str = AUTHOR_CACHE, **kw) -> "PostAuthorCache":
+        """Una instancia por archivo y proceso (varios crawlers en el mismo proceso la comparten)."""
+        key = os.path.abspath(path)
+        if key not in cls._shared:
+            cls._shared[key] = cls(path, **kw)
+        return cls._shared[key]
+
+    def get(self, key: str) -> str|None:
+        code = shortcode(key)
+        row = self.db.execute("SELECT username, resolved_at FROM post_authors WHERE code = ?", (code,)).fetchone()
+        if row and row[1] >= time.time() - self.ttl_s:
+            self.hits += 1
+            self.touched[code] = self._stamp()
+            if len(self.touched) >= FLUSH_EVERY:
+                self.flush()
+            return row[0]
+        self.misses += 1
+        return None
+
+    def _stamp(self) -> float:
+        """Marca de uso estrictamente creciente dentro del proceso (orden LRU sin empates)."""
+        self.last_stamp = max(time.time(), self.last_stamp + 1e-6)
+        return self.last_stamp
+
+    def put(self, key: str, username: str):
+        self.db.execute("INSERT OR REPLACE INTO post_authors VALUES (?, ?, ?, ?)",
+                        (shortcode(key), username, int(time.time()), self._stamp()))
+        self.puts += 1
+        self.count += 1
+        self.pending += 1
+        if self.pending >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Commit de altas + used_at de los hits, y poda LRU si se pasó del tope."""
+        if self.touched:
+            self.db.executemany("UPDATE post_authors SET used_at = ? WHERE code = ?",
+                                ((t, c) for c, t in self.touched.items()))
+            self.touched.clear()
+        self.pending = 0
+        if self.count > self.max_entries:
+            (self.count,) = self.db.execute("SELECT COUNT(*) FROM post_authors").fetchone()
+            if self.count > self.max_entries:
+                self.db.execute("""DELETE FROM post_authors WHERE code IN (
+                    SELECT code FROM post_authors ORDER BY used_at, resolved_at LIMIT ?)""", (self.count - self.max_entries,))
+                self.count = self.max_entries
+        self.db.commit()
+
+    def close(self):
+        # la conexión queda abierta: la instancia se comparte entre crawlers del proceso
+        self.flush()
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = f"{self.hits / total * 100:.0f}%" if total else "-"
+        return (f"🧠 Caché post→autor: {self.hits} hits / {self.misses} misses ({rate}) · "
+                f"+{self.puts} nuevos en {self.path.name}")
@@ -0,0 +1,507 @@
+# ig_crawler_engine.py
+# Motor común de los crawlers de grid (hashtag, ubicación, grid de un perfil).
+# Una fuente dice QUÉ grid recorrer; uno o más sinks dicen DÓNDE escribir los
+# usuarios. Lo demás (login, modo liviano, cosecha en dos etapas o click
+# post a post, dedup, topes, reporte) vive acá una sola vez.
+#
+# Uso desde código:
+#   engine = CrawlEngine(HashtagSource("n8n"), [CsvSink("ig_users.csv"), JsonlSink("ig_users.jsonl")])
+#   users = await engine.run()
+#
+# Uso desde la CLI:
+#   python ig_crawler_engine.py --hashtag n8n --sink csv:ig_users.csv --sink db:crawl_users.sqlite
+#   python ig_crawler_engine.py --location-url "https://www.instagram.com/explore/locations/.../" --sink txt:ig_users.txt
+#   python ig_crawler_engine.py --profile-grid natgeo --sink jsonl:natgeo.jsonl
+#
+# ig_hashtag_users.py (CSV), InstagramHashtagCrawler2.py (TXT con dedup de corridas
+# anteriores) e ig_locations.py (CSV por ubicación) son envoltorios finos sobre este motor.
+
+import asyncio, csv, json, re, time, random, sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, List
+from playwright.async_api import TimeoutError as PWTimeout
+from ig_author_cache import AUTHOR_CACHE, PostAuthorCache
+from ig_harvest import (EXTRACT_STATS, GRID_HREFS_JS, POST_SEL, extract_summary, extract_username,
+                        extract_username_from_post_page, harvest_grid, parse_post_href, post_url)
+from ig_lightweight import ResourceFilter
+from ig_runtime import context_scope, login_wall, runtime_scope
+from ig_seen_posts import SEEN_FILE, SeenPosts
+from ig_user_index import UserIndex
+
+# ================== Config ==================
+PER_CYCLE    = 6           # modo click: posts abiertos por ciclo antes de scrollear
+DELAY_MS     = 300         # pausa entre posts (ms)
+MAX_USERS    = 300         # tope de usuarios (0 = sin límite)
+USER_DATA    = "./ig_profile"
+LIGHTWEIGHT  = True        # bloquea imágenes/video/fuentes (ver ig_lightweight.py)
+MODE         = "harvest"   # harvest: hrefs del grid + autores en paralelo (ig_harvest.py) · click: modal post a post
+                           # · tabs: pestaña nueva por post
+WORKERS      = 3           # páginas resolviendo posts en modo harvest
+IDLE_CYCLES  = 6           # modo click: ciclos sin posts nuevos para dar el grid por terminado
+VIEWPORT     = {"width": 1280, "height": 900}
+USER_AGENT   = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                "(KHTML, like Gecko) Chrome/118.0 Safari/537.36")
+
+DIALOG_SEL = 'div[role="dialog"]'
+# ============================================
+
+def rand(a,b):
+    return a + random.random()*(b-a)
+
+def profile_url(user: str) -> str:
+    return f"https://www.instagram.com/{user}/"
+
+# ----------------- Fuentes -----------------
+class GridSource:
+    """Un grid de posts para recorrer: url + etiqueta para logs/sinks."""
+
+    def __init__(self, url: str, label: str):
+        self.url, self.label = url, label
+
+    async def prepare(self, page):
+        """Ajustes de la página antes del login (banners, etc.)."""
+
+    async def ready(self, page):
+        """Espera a que el grid tenga posts, ya logueado."""
+        await wait_for_grid(page)
+
+class HashtagSource(GridSource):
+    def __init__(self, hashtag: str):
+        tag = hashtag.strip().lstrip("#")
+        super().__init__(f"https://www.instagram.com/explore/tags/{tag}/", f"#{tag}")
+
+class LocationSource(GridSource):
+    def __init__(self, location_url: str):
+        super().__init__(location_url, location_url.rstrip("/").rsplit("/", 1)[-1] or location_url)
+
+    async def prepare(self, page):
+        await accept_cookies(page)
+
+    async def ready(self, page, timeout_ms=25000):
+        # las ubicaciones a veces no pintan el grid hasta scrollear un poco
+        start = time.time()
+        while (time.time() - start)*1000 < timeout_ms:
+            try:
+                if await page.locator(POST_SEL).count():
+                    return
+            except: pass
+            await page.mouse.wheel(0, 900)
+            await asyncio.sleep(0.5)
+        raise PWTimeout(f"No se encontró ningún post ({POST_SEL}) en {timeout_ms}ms")
+
+class ProfileGridSource(GridSource):
+    """Grid de un perfil (posts, o tagged para quién etiqueta a la cuenta)."""
+
+    def __init__(self, user: str, tab: str = ""):
+        user = user.strip().lstrip("@")
+        super().__init__(profile_url(user) + (f"{tab}/" if tab else ""), f"@{user}" + (f"/{tab}" if tab else ""))
+
+# ----------------- Sinks -----------------
+class Sink:
+    """Destino de usuarios. `has` permite dedup contra corridas anteriores."""
+
+    def has(self, user: str) -> bool:
+        return False
+
+    def write(self, user: str, post: str, source: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CsvSink(Sink):
+    def __init__(self, path: str):
+        self.path = path
+        new_file = not Path(path).exists()
+        self.f = open(path, "a", newline="", encoding="utf-8")
+        self.w = csv.writer(self.f)
+        if new_file:
+            self.w.writerow(["username","profile_url","ts"])
+            self.f.flush()
+
+    def write(self, user: str, post: str, source: str):
+        self.w.writerow([user, profile_url(user), int(time.time())])
+        self.f.flush()  # asegura disco ante cortes
+
+    def close(self):
+        self.f.close()
+
+class TxtSink(Sink):
+    """
+    Una línea instagram.com/<user>; no repite usuarios de corridas anteriores.
+    El dedup va contra el índice persistente <path>.uidx (ig_user_index.py), no
+    contra el TXT entero cargado en memoria.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = UserIndex(path)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def has(self, user: str) -> bool:
+        return user in self.index
+
+    def write(self, user: str, post: str, source: str):
+        self.f.write(f"instagram.com/{user}\n")
+        self.f.flush()
+        self.index.add(user, self.f.tell())
+
+    def close(self):
+        self.f.close()
+        self.index.close()
+
+class JsonlSink(Sink):
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, user: str, post: str, source: str):
+        self.f.write(json.dumps({"user": user, "profile_url": profile_url(user), "post": post,
+                                 "source": source, "ts": int(time.time())}, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class DbSink(Sink):
+    """SQLite: un usuario por fila con la primera fuente/post donde apareció."""
+
+    def __init__(self, path: str = "crawl_users.sqlite"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS grid_users (
+            username TEXT PRIMARY KEY, source TEXT, post TEXT, ts INTEGER) WITHOUT ROWID""")
+
+    def has(self, user: str) -> bool:
+        return self.db.execute("SELECT 1 FROM grid_users WHERE username = ?", (user,)).fetchone() is not None
+
+    def write(self, user: str, post: str, source: str):
+        self.db.execute("INSERT OR IGNORE INTO grid_users VALUES (?, ?, ?, ?)", (user, source, post, int(time.time())))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+SINKS = {"csv": CsvSink, "txt": TxtSink, "jsonl": JsonlSink, "db": DbSink}
+
+def make_sink(spec: str) -> Sink:
+    """'csv:ig_users.csv', 'txt:...', 'jsonl:...', 'db:...'"""
+    kind, _, path = spec.partition(":")
+    if kind not in SINKS or not path:
+        raise ValueError(f"sink inválido {spec!r} (formato tipo:ruta, tipos: {', '.join(SINKS)})")
+    return SINKS[kind](path)
+
+# ----------------- Página -----------------
+async def ensure_login(page):
+    # Si no estás logueado, esperá a que aparezca login y logueate manualmente.
+    if "login" in page.url or "/accounts/login" in page.url:
+        await login_wall(page)
+
+async def accept_cookies(page):
+    try:
+        candidates = [
+            "Allow all cookies","Allow essential cookies","Accept all",
+            "Aceptar todas las cookies","Permitir todas","Aceptar",
+            "Solo esenciales","Sólo esenciales","Permitir"
+        ]
+        for t in candidates:
+            btn = page.get_by_role("button", name=re.compile(t, re.I))
+            if await btn.count():
+                await btn.first.click()
+                await asyncio.sleep(0.3)
+                break
+    except: pass
+
+# una sola evaluación: hrefs de los tiles dentro de la franja visible (sin handle por tile)
+VISIBLE_TILES_JS = """
+([sel, top, bottom]) => {
+  const maxY = window.innerHeight - bottom, out = [];
+  for (const a of document.querySelectorAll(sel)) {
+    const r = a.getBoundingClientRect();
+    if (!r.width && !r.height) continue;
+    if (r.top >= top && r.top <= maxY) out.push(a.getAttribute("href"));
+  }
+  return out;
+}
+"""
+
+async def get_visible_tiles(page):
+    """hrefs de los posts visibles, en orden del grid, en un solo round-trip."""
+    return await page.evaluate(VISIBLE_TILES_JS, [POST_SEL, 100, 80])
+
+async def wait_for_grid(page, timeout=10000):
+    await page.wait_for_selector(POST_SEL, timeout=timeout)
+
+async def extract_username_from_dialog(dlg):
+    """@ del autor desde el modal abierto (un solo round-trip, ver ig_harvest.extract_username)."""
+    return (await extract_username(dlg))[0]
+
+async def click_and_grab_username(page, visited_posts: set, delay_ms: int = DELAY_MS,
+                                  should_stop: Callable[[], bool] = lambda: False, cache=None,
+                                  tried: set|None = None):
+    """Abre el primer post visible NO visitado ni intentado en su modal y devuelve (post, usuario).
+    Si el autor sale del href o de `cache`, no se abre el modal. El post pasa a
+    `visited_posts` solo si se encontró el autor; si no, queda en `tried` (esta corrida)."""
+    tried = tried if tried is not None else set()
+    if should_stop():
+        return None, None
+    for href in await get_visible_tiles(page):
+        if should_stop():
+            return None, None
+        code, user = parse_post_href(href or "")
+        if not code:
+            continue
+        purl = post_url(code)
+        if purl in visited_posts or purl in tried:
+            continue
+        tried.add(purl)
+        user = user or (cache.get(code) if cache is not None else None)
+        if user:
+            visited_posts.add(purl)
+            return purl, user
+
+        t = page.locator(f'a[href="{href}"]').first
+        await t.scroll_into_view_if_needed()
+        await asyncio.sleep(rand(0.05,0.15))
+        await t.click()
+        dlg = page.locator(DIALOG_SEL)
+        try:
+            await dlg.wait_for(state="visible", timeout=6000)
+            user = await extract_username_from_dialog(dlg)
+            if user:
+                visited_posts.add(purl)
+                if cache is not None:
+                    cache.put(code, user)
+        except PWTimeout:
+            user = None
+        finally:
+            # cerrar modal
+            try:
+                close_btn = dlg.locator('[aria-label="Close"], [aria-label="Cerrar"]').first
+                if await close_btn.count():
+                    await close_btn.click()
+                else:
+                    await page.keyboard.press("Escape")
+            except:
+                pass
+        await asyncio.sleep(delay_ms/1000.0)
+        return purl, user
+    return None, None
+
+async def open_and_grab(ctx, post_url: str, delay_ms: int = DELAY_MS):
+    """Abre el post en una pestaña nueva, extrae el username y la cierra."""
+    p = await ctx.new_page()
+    try:
+        await p.goto(post_url, wait_until="domcontentloaded", timeout=45000)
+        if "login" in p.url:
+            print("ℹ️ Login wall en post. Inicia sesión una vez en la sesión persistente y reintenta.")
+            return None
+        # espera a que aparezca algo del header o contenido
+        try:
+            await p.wait_for_selector('header, article', timeout=8000)
+        except PWTimeout:
+            pass
+        user = await extract_username_from_post_page(p)
+        await asyncio.sleep(delay_ms/1000.0)
+        return user
+    finally:
+        await p.close()
+
+# ----------------- Motor -----------------
+class CrawlEngine:
+    """
+    Recorre `source` y escribe cada usuario nuevo en todos los `sinks`.
+    `on_user(user)` se llama por cada usuario nuevo (p.ej. ig_daemon.py) y
+    `stop_event` permite cortar ordenadamente desde afuera (Ctrl+C).
+    Con `seen` (ig_seen_posts.SeenPosts) se saltean los posts ya resueltos en
+    corridas anteriores; sin él, solo se evita repetir dentro de la corrida. Un post
+    sin autor (login wall, timeout) no entra en `seen`: se reintenta la próxima vez.
+    Con `cache` (ig_author_cache.PostAuthorCache) el autor de un post ya resuelto
+    alguna vez sale de la caché, sin abrir modal ni página.
+    """
+
+    def __init__(self, source: GridSource, sinks: Iterable[Sink], mode: str = MODE, workers: int = WORKERS,
+                 per_cycle: int = PER_CYCLE, delay_ms: int = DELAY_MS, max_users: int = MAX_USERS,
+                 lightweight: bool = LIGHTWEIGHT, on_user: Callable[[str], None]|None = None,
+                 stop_event: asyncio.Event|None = None, label: str = "ig_crawler_engine",
+                 user_agent: str = USER_AGENT, seen: SeenPosts|None = None,
+                 cache: PostAuthorCache|None = None):
+        self.source, self.sinks = source, list(sinks)
+        self.mode, self.workers, self.per_cycle, self.delay_ms = mode, workers, per_cycle, delay_ms
+        self.max_users, self.lightweight, self.on_user = max_users, lightweight, on_user
+        self.stop_event, self.label, self.user_agent = stop_event, label, user_agent
+        self.users: set = set()
+        self.seen, self.cache = seen, cache
+        self.visited = seen if seen is not None else set()
+        self.tried: set = set()   # posts abiertos en esta corrida (con o sin autor)
+        self.posts = 0   # posts procesados en esta corrida
+
+    def limit_reached(self) -> bool:
+        return bool(self.max_users and len(self.users) >= self.max_users)
+
+    def should_stop(self) -> bool:
+        return bool(self.stop_event and self.stop_event.is_set()) or self.limit_reached()
+
+    def add_user(self, user: str, post: str = "") -> bool:
+        if user in self.users or any(s.has(user) for s in self.sinks):
+            return False
+        self.users.add(user)
+        for s in self.sinks:
+            s.write(user, post, self.source.label)
+        print(f"+ @{user}  (total: {len(self.users)})")
+        if self.on_user:
+            self.on_user(user)
+        return True
+
+    async def run_click(self, page):
+        """Modo click: abrir/leer/cerrar N posts por ciclo y scrollear (sobre el grid que `run` ya cargó)."""
+        idle_cycles, prev = 0, set()
+        while not self.should_stop():
+            got_in_cycle = 0
+            for _ in range(self.per_cycle):
+                post, user = await click_and_grab_username(page, self.visited, self.delay_ms, self.should_stop,
+                                                           self.cache, self.tried)
+                if not post:
+                    # no encontró visible → corta para scrollear
+                    break
+                self.posts += 1
+                if user:
+                    self.add_user(user, post)
+                    got_in_cycle += 1
+                if self.should_stop():
+                    break
+
+            # scroll y pausa
+            await page.mouse.wheel(0, 900)
+            await asyncio.sleep(rand(0.6, 1.2))
+
+            # progreso = posts leídos o tiles nuevos en pantalla (aunque ya estuvieran vistos de antes)
+            visible = set(await get_visible_tiles(page))
+            grew = not prev.issuperset(visible)
+            prev = visible
+            idle_cycles = 0 if got_in_cycle or grew else idle_cycles + 1
+            if idle_cycles >= IDLE_CYCLES:
+                print("ℹ️ No aparecen más posts nuevos en el grid. Fin.")
+                break
+
+    async def run_tabs(self, ctx, page):
+        """Modo tabs: una pestaña nueva por post, de a uno; hasta `per_cycle` usuarios por ciclo."""
+        idle_cycles, prev = 0, set()
+        while not self.should_stop():
+            hrefs = await page.evaluate(GRID_HREFS_JS, POST_SEL)   # un solo round-trip
+            grew = not prev.issuperset(hrefs)   # el grid avanzó aunque sean posts ya vistos
+            prev = set(hrefs)
+            got_in_cycle = 0
+            for href in hrefs:
+                code, user = parse_post_href(href)
+                if not code:
+                    continue
+                purl = post_url(code)
+                if purl in self.visited or purl in self.tried:
+                    continue
+                self.tried.add(purl)
+                self.posts += 1
+                user = user or (self.cache.get(code) if self.cache is not None else None)
+                if not user:
+                    user = await open_and_grab(ctx, purl, self.delay_ms)
+                    if user and self.cache is not None:
+                        self.cache.put(code, user)
+                if user:
+                    self.visited.add(purl)
+                    self.add_user(user, purl)
+                    got_in_cycle += 1
+                if self.should_stop() or got_in_cycle >= self.per_cycle:
+                    break
+
+            # sin usuarios en el ciclo se scrollea más fuerte
+            idle_cycles = 0 if got_in_cycle or grew else idle_cycles + 1
+            await page.mouse.wheel(0, 900 if got_in_cycle else 1600)
+            await asyncio.sleep(rand(0.6, 1.2))
+            if idle_cycles >= IDLE_CYCLES:
+                print("ℹ️ No aparecen más posts nuevos en el grid. Fin.")
+                break
+
+    async def run(self, runtime=None) -> set:
+        async with context_scope(runtime, USER_DATA, viewport=VIEWPORT, user_agent=self.user_agent) as ctx:
+            rf = await ResourceFilter(self.lightweight).install(ctx)
+            page = await ctx.new_page()
+            await page.goto(self.source.url, wait_until="domcontentloaded")
+            await self.source.prepare(page)
+            await ensure_login(page)
+            await self.source.ready(page)
+
+            print(f"▶️ Empezando en {self.source.label}… (modo {self.mode})")
+            extract_base = Counter(EXTRACT_STATS)
+            try:
+                if self.mode == "harvest":
+                    stats = await harvest_grid(ctx, page, self.source.url, self.workers, self.delay_ms,
+                                               on_user=lambda user, post, _src: self.add_user(user, post),
+                                               should_stop=self.should_stop, visited=self.visited,
+                                               navigate=False, cache=self.cache)
+                    self.posts = stats["posts"]
+                elif self.mode == "tabs":
+                    await self.run_tabs(ctx, page)
+                else:
+                    await self.run_click(page)
+                if self.stop_event and self.stop_event.is_set():
+                    print("ℹ️ Parada solicitada. Cerrando ordenadamente…")
+                elif self.limit_reached():
+                    print(f"✅ Tope de usuarios ({self.max_users}) alcanzado.")
+            except KeyboardInterrupt:
+                # Respaldo por si el manejador de señal no alcanzó a setear el evento
+                print("\n🛑 Interrupción detectada. Guardando y saliendo…")
+            finally:
+                for s in self.sinks:
+                    try:
+                        s.close()
+                    except Exception:
+                        pass
+                if self.seen is not None:
+                    self.seen.close()
+                    print(self.seen.summary())
+                if self.cache is not None:
+                    self.cache.close()
+                    print(self.cache.summary())
+                print(extract_summary(extract_base))
+                rf.report(self.label, units=self.posts)
+        return self.users
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Crawler de grids de Instagram (hashtag / ubicación / perfil) con sinks enchufables")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--hashtag")
+    src.add_argument("--location-url")
+    src.add_argument("--profile-grid", metavar="USER", help="Grid de un perfil")
+    p.add_argument("--tab", default="", help="Con --profile-grid: pestaña (p.ej. tagged)")
+    p.add_argument("--sink", action="append", default=[], help="tipo:ruta (csv, txt, jsonl, db); repetible")
+    p.add_argument("--mode", default=MODE, choices=["harvest", "click", "tabs"])
+    p.add_argument("--workers", type=int, default=WORKERS)
+    p.add_argument("--per-cycle", type=int, default=PER_CYCLE)
+    p.add_argument("--delay-ms", type=int, default=DELAY_MS)
+    p.add_argument("--max-users", type=int, default=MAX_USERS)
+    p.add_argument("--seen-file", default=SEEN_FILE, help="Registro de posts ya procesados (compartido entre corridas y crawlers)")
+    p.add_argument("--no-seen", dest="seen_file", action="store_const", const=None, help="No saltear posts de corridas anteriores")
+    p.add_argument("--author-cache", default=AUTHOR_CACHE, help="Caché SQLite post→autor (compartida entre corridas y crawlers)")
+    p.add_argument("--no-author-cache", dest="author_cache", action="store_const", const=None, help="Resolver siempre el autor en el navegador")
+    p.add_argument("--no-lightweight", dest="lightweight", action="store_false", help="No bloquear imágenes/video/fuentes")
+    p.add_argument("--headless", action="store_true", help="Navegador compartido sin ventana, con la sesión guardada de ig_profile (ver ig_runtime.py)")
+    a = p.parse_args()
+
+    if a.hashtag:
+        source = HashtagSource(a.hashtag)
+    elif a.location_url:
+        source = LocationSource(a.location_url)
+    else:
+        source = ProfileGridSource(a.profile_grid, a.tab)
+    sinks: List[Sink] = [make_sink(s) for s in (a.sink or ["csv:ig_users.csv"])]
+
+    async def cli():
+        async with runtime_scope(a.headless) as rt:
+            engine = CrawlEngine(source, sinks, a.mode, a.workers, a.per_cycle, a.delay_ms, a.max_users, a.lightweight,
+                                 seen=SeenPosts.open(a.seen_file) if a.seen_file else None,
+                                 cache=PostAuthorCache.open(a.author_cache) if a.author_cache else None)
+            await engine.run(rt)
+    asyncio.run(cli())
@@ -0,0 +1,362 @@
+# ig_daemon.py
+# Daemon de crawling: mantiene UN navegador caliente (ig_runtime.IGRuntime, headless,
+# con la sesión de ./ig_profile) y recibe jobs por una API HTTP local o por un
+# Unix socket. Cada job corre sobre su propio contexto del navegador compartido, así
+# que no se paga el arranque de Chromium ni el chequeo de login por job.
+#
+# Uso:
+#   python ig_daemon.py                          # http://127.0.0.1:8765
+#   python ig_daemon.py --socket /tmp/igd.sock   # Unix socket
+#
+# API (JSON):
+#   POST   /jobs                 {"type": "hashtag", "params": {"hashtag": "n8n", "max_users": 50}}
+#                                -> {"id": "...", "status": "queued", ...}
+#   GET    /jobs                 lista de jobs con su progreso
+#   GET    /jobs/<id>            estado y progreso de un job
+#   GET    /jobs/<id>/results    resultados en NDJSON; se transmiten a medida que
+#                                aparecen y la respuesta termina cuando el job termina
+#   DELETE /jobs/<id>            cancela el job
+#   GET    /health
+#
+# Cada job escribe sus salidas (CSV, índices, checkpoints) en ig_daemon_jobs/<id>/.
+# Si Instagram pide login a mitad de un job, el job falla (LoginRequired) en vez de
+# quedarse esperando un ENTER que frenaría a todos los demás.
+#
+# Tipos de job y params (todos opcionales salvo los marcados *):
+#   hashtag    hashtag*, per_cycle, delay_ms, max_users, mode, workers, lightweight (ig_hashtag_users.py)
+#   location   location_url*, per_cycle, delay_ms, max_users, mode, workers, lightweight (ig_locations.py)
+#   followers  user*, max, delay_ms, incremental, lightweight         (IGFollowersFollowing.py)
+#   contacts   users* (lista), workers, delay_ms, mode, lightweight   (IGC.py)
+#   downloads  links* (lista), workers, fragmentos                     (instagram video downloader.py;
+#              videos en <id>/videos/ y registro en <id>/descargas.sqlite)
+#
+# Ejemplo:
+#   curl -s -XPOST localhost:8765/jobs -d '{"type":"contacts","params":{"users":["nasa"]}}'
+#   curl -sN localhost:8765/jobs/<id>/results
+
+import asyncio, importlib.util, itertools, json, signal, threading, time
+from pathlib import Path
+from typing import Callable, Dict, List
+from ig_runtime import IGRuntime, USER_DATA
+
+HOST         = "127.0.0.1"
+PORT         = 8765
+MAX_JOBS     = 3       # jobs corriendo a la vez (cada uno con su contexto)
+JOB_HISTORY  = 500     # jobs terminados que se conservan (con sus resultados) para consultar
+MAX_BODY     = 8 << 20 # tope del cuerpo de un POST
+JOBS_DIR     = "./ig_daemon_jobs"   # salidas y checkpoints propios de cada job: <JOBS_DIR>/<id>/
+
+# ----------------- Jobs -----------------
+class Job:
+    """Un job con su progreso y sus resultados (para transmitirlos mientras corre)."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, type_: str, params: Dict):
+        self.id = f"{int(time.time())}-{next(self._ids)}"
+        self.type = type_
+        self.params = params
+        self.status = "queued"      # queued | running | done | failed | cancelled
+        self.error = None
+        self.results: List[Dict] = []
+        self.created = time.time()
+        self.started = self.finished = None
+        self.task: asyncio.Task|None = None
+        self._changed = asyncio.Event()
+
+    def emit(self, item: Dict):
+        self.results.append(item)
+        self._notify()
+
+    def _notify(self):
+        # despierta a los que esperan y arma un evento nuevo para la próxima vez
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, status: str, error: str|None = None):
+        self.status, self.error, self.finished = status, error, time.time()
+        self._notify()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    async def follow(self):
+        """Itera los resultados: primero los ya emitidos, después los nuevos hasta que el job termine."""
+        i = 0
+        while True:
+            changed = self._changed
+            while i < len(self.results):
+                yield self.results[i]
+                i += 1
+            if not self.active:
+                return
+            await changed.wait()
+
+    def info(self) -> Dict:
+        end = self.finished or time.time()
+        return {
+            "id": self.id, "type": self.type, "params": self.params, "status": self.status,
+            "results": len(self.results), "last": self.results[-1] if self.results else None,
+            "error": self.error, "created": int(self.created),
+            "elapsed_s": round(end - self.started, 1) if self.started else 0.0,
+        }
+
+# ----------------- Runners por tipo -----------------
+def _load_downloader():
+    # el archivo tiene espacios en el nombre: se importa por ruta (y solo si hace falta yt_dlp)
+    path = Path(__file__).with_name("instagram video downloader.py")
+    spec = importlib.util.spec_from_file_location("ig_video_downloader", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def _require(params: Dict, key: str):
+    if not params.get(key):
+        raise ValueError(f"falta el parámetro '{key}'")
+    return params[key]
+
+# Cada runner recibe `workdir` (<JOBS_DIR>/<id>): ahí van CSVs, índices y checkpoints
+# del job, así dos jobs (o un job y la CLI) no comparten ni se pisan archivos.
+async def run_hashtag(rt: IGRuntime, p: Dict, emit: Callable[[Dict], None], workdir: Path):
+    import ig_hashtag_users as m
+    tag = _require(p, "hashtag").strip("#")
+    await m.main(tag, p.get("per_cycle", m.PER_CYCLE), p.get("delay_ms", m.DELAY_MS), p.get("max_users", m.MAX_USERS),
+                 p.get("lightweight", m.LIGHTWEIGHT), runtime=rt, handle_signals=False,
+                 mode=p.get("mode", m.MODE), workers=p.get("workers", m.WORKERS), out_csv=str(workdir / "users.csv"),
+                 on_user=lambda u: emit({"user": u, "hashtag": tag, "profile_url": f"https://www.instagram.com/{u}/"}))
+
+async def run_location(rt: IGRuntime, p: Dict, emit: Callable[[Dict], None], workdir: Path):
+    import ig_locations as m
+    url = _require(p, "location_url")
+    await m.main(url, p.get("per_cycle", m.PER_CYCLE), p.get("delay_ms", m.DELAY_MS), p.get("max_users", m.MAX_USERS),
+                 p.get("lightweight", m.LIGHTWEIGHT), runtime=rt,
+                 mode=p.get("mode", m.MODE), workers=p.get("workers", m.WORKERS), out_csv=str(workdir / "users.csv"),
+                 on_user=lambda u: emit({"user": u, "location_url": url, "profile_url": f"https://www.instagram.com/{u}/"}))
+
+async def run_followers(rt: IGRuntime, p: Dict, emit: Callable[[Dict], None], workdir: Path):
+    import IGFollowersFollowing as m
+    user = _require(p, "user").strip().lstrip("@")
+    await m.main(user, p.get("delay_ms", m.DELAY_MS), p.get("max", m.MAX_FETCH),
+                 checkpoint_dir=str(workdir / "checkpoints"), out_dir=str(workdir),
+                 incremental=p.get("incremental", False), lightweight=p.get("lightweight", m.LIGHTWEIGHT), runtime=rt,
+                 on_user=lambda which, u: emit({"owner": user, "type": which, "user": u}))
+
+async def run_contacts(rt: IGRuntime, p: Dict, emit: Callable[[Dict], None], workdir: Path):
+    import IGC as m
+    users = _require(p, "users")
+    if isinstance(users, str):
+        users = users.split(",")
+    await m.main(delay_ms=p.get("delay_ms", m.DELAY_MS), workers=p.get("workers", m.WORKERS),
+                 mode=p.get("mode", m.EXTRACT_MODE), lightweight=p.get("lightweight", m.LIGHTWEIGHT),
+                 runtime=rt, users=users, on_row=emit, out_csv=str(workdir / "contacts.csv"))
+
+async def run_downloads(rt: IGRuntime, p: Dict, emit: Callable[[Dict], None], workdir: Path):
+    links = _require(p, "links")
+    if isinstance(links, str):
+        links = links.split()
+    mod = _load_downloader()
+    loop = asyncio.get_running_loop()
+    parar = threading.Event()
+    # yt_dlp es bloqueante: corre en un hilo y entrega resultados al loop
+    fut = asyncio.ensure_future(asyncio.to_thread(
+        mod.descargar_videos, links, lambda item: loop.call_soon_threadsafe(emit, item),
+        workers=p.get("workers", mod.WORKERS), fragmentos=p.get("fragmentos", mod.FRAGMENTOS),
+        archivo=str(workdir / "descargas.sqlite"), carpeta=str(workdir / "videos"), parar=parar))
+    try:
+        await asyncio.shield(fut)
+    except asyncio.CancelledError:
+        # cancelar la corrutina no frena los hilos: se les avisa y se espera a que corten
+        parar.set()
+        await asyncio.wait([fut])
+        raise
+
+RUNNERS = {
+    "hashtag":   run_hashtag,
+    "location":  run_location,
+    "followers": run_followers,
+    "contacts":  run_contacts,
+    "downloads": run_downloads,
+}
+
+# ----------------- Daemon -----------------
+class CrawlDaemon:
+    def __init__(self, runtime: IGRuntime, max_jobs: int = MAX_JOBS):
+        self.rt = runtime
+        self.slots = asyncio.Semaphore(max(1, max_jobs))
+        self.jobs: Dict[str, Job] = {}
+
+    def submit(self, type_: str, params: Dict) -> Job:
+        if not isinstance(type_, str) or type_ not in RUNNERS:
+            raise ValueError(f"tipo de job desconocido: {type_!r} (válidos: {', '.join(RUNNERS)})")
+        job = Job(type_, params or {})
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job):
+        try:
+            async with self.slots:
+                job.status, job.started = "running", time.time()
+                print(f"▶️ job {job.id} ({job.type}) {json.dumps(job.params, ensure_ascii=False)[:120]}")
+                workdir = Path(JOBS_DIR) / job.id
+                workdir.mkdir(parents=True, exist_ok=True)
+                await RUNNERS[job.type](self.rt, job.params, job.emit, workdir)
+            job.finish("done")
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+        except Exception as e:
+            job.finish("failed", f"{type(e).__name__}: {e}")
+        print(f"{'✅' if job.status == 'done' else '⚠️'} job {job.id} {job.status}: {len(job.results)} resultados"
+              + (f" ({job.error})" if job.error else ""))
+
+    def cancel(self, job: Job):
+        if job.active and job.task:
+            job.task.cancel()
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if not j.active]
+        for j in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[j.id]
+
+    async def shutdown(self):
+        tasks = [j.task for j in self.jobs.values() if j.active and j.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------- HTTP mínimo (stdlib) ----------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await read_request(reader)
+            await self.route(method, path, body, writer)
+        except (ValueError, json.JSONDecodeError) as e:
+            await send_json(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def route(self, method: str, path: str, body: bytes, writer):
+        parts = [x for x in path.split("?")[0].split("/") if x]
+        if parts == ["health"]:
+            return await send_json(writer, 200, {"ok": True, "jobs": sum(j.active for j in self.jobs.values())})
+        if not parts or parts[0] != "jobs":
+            return await send_json(writer, 404, {"error": "no encontrado"})
+        if len(parts) == 1:
+            if method == "POST":
+                req = json.loads(body or b"{}")
+                if not isinstance(req, dict):
+                    raise ValueError('el cuerpo debe ser un objeto JSON: {"type": ..., "params": {...}}')
+                params = req.get("params") or {}
+                if not isinstance(params, dict):
+                    raise ValueError('"params" debe ser un objeto JSON')
+                job = self.submit(req.get("type", ""), params)
+                return await send_json(writer, 202, job.info())
+            if method == "GET":
+                return await send_json(writer, 200, [j.info() for j in self.jobs.values()])
+            return await send_json(writer, 405, {"error": "método no permitido"})
+        job = self.jobs.get(parts[1])
+        if not job:
+            return await send_json(writer, 404, {"error": f"job {parts[1]} no existe"})
+        if len(parts) == 2 and method == "GET":
+            return await send_json(writer, 200, job.info())
+        if len(parts) == 2 and method == "DELETE":
+            self.cancel(job)
+            return await send_json(writer, 202, job.info())
+        if len(parts) == 3 and parts[2] == "results" and method == "GET":
+            return await stream_results(writer, job)
+        return await send_json(writer, 404, {"error": "no encontrado"})
+
+async def read_request(reader: asyncio.StreamReader):
+    line = (await reader.readline()).decode("latin-1").strip()
+    if not line:
+        raise ConnectionError("conexión vacía")
+    method, path, _ = line.split(" ", 2)
+    headers = {}
+    while True:
+        h = (await reader.readline()).decode("latin-1").strip()
+        if not h:
+            break
+        k, _, v = h.partition(":")
+        headers[k.strip().lower()] = v.strip()
+    n = int(headers.get("content-length") or 0)
+    if n > MAX_BODY:
+        raise ValueError("cuerpo demasiado grande")
+    body = await reader.readexactly(n) if n else b""
+    return method.upper(), path, body
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+async def send_json(writer, status: int, data):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+async def stream_results(writer, job: Job):
+    """NDJSON con chunked encoding: cada resultado sale apenas el job lo emite; al final, el estado del job."""
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                 b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+    async def chunk(obj):
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+
+    async for item in job.follow():
+        await chunk(item)
+    await chunk({"_job": job.info()})
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+# ----------------- Main -----------------
+async def main(host: str = HOST, port: int = PORT, socket_path: str|None = None,
+               max_jobs: int = MAX_JOBS, user_data: str = USER_DATA, headless: bool = True):
+    async with IGRuntime(user_data, headless=headless) as rt:
+        daemon = CrawlDaemon(rt, max_jobs)
+        if socket_path:
+            Path(socket_path).unlink(missing_ok=True)
+            server = await asyncio.start_unix_server(daemon.handle, path=socket_path)
+            where = f"unix:{socket_path}"
+        else:
+            server = await asyncio.start_server(daemon.handle, host, port)
+            where = f"http://{host}:{port}"
+        print(f"🟢 ig_daemon escuchando en {where} · navegador listo · hasta {max_jobs} jobs a la vez")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: queda el KeyboardInterrupt
+        async with server:
+            try:
+                await stop.wait()
+            finally:
+                print("\n🛑 Cerrando daemon: cancelando jobs activos…")
+                server.close()
+                await daemon.shutdown()
+                if socket_path:
+                    Path(socket_path).unlink(missing_ok=True)
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Daemon de crawling con navegador caliente y API de jobs")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--socket", default=None, help="Escuchar en un Unix socket en vez de TCP")
+    p.add_argument("--max-jobs", type=int, default=MAX_JOBS, help="Jobs corriendo a la vez")
+    p.add_argument("--headed", dest="headless", action="store_false", help="Navegador con ventana (debug)")
+    a = p.parse_args()
+    try:
+        asyncio.run(main(a.host, a.port, a.socket, a.max_jobs, headless=a.headless))
+    except KeyboardInterrupt:
+        pass
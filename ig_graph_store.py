@@ -0,0 +1,288 @@
+# ig_graph_store.py
+# Grafo de seguidores/seguidos en SQLite (reemplaza follow_graph_{user}.csv).
+#   - usernames internados en una tabla (cada arista son 2 enteros + tipo)
+#   - una fila por (owner, user, type) con first_seen / last_seen: recrawlear
+#     la misma cuenta actualiza last_seen en vez de duplicar filas
+#   - índices para "¿quién sigue a X?" y "¿qué cambió desde el último crawl?"
+#   - pos = posición en el orden del dialog (para recrawls incrementales)
+#
+# Uso (consultas):
+#   python ig_graph_store.py --db follow_graph.sqlite --who-follows usuario
+#   python ig_graph_store.py --db follow_graph.sqlite --changes usuario --type followers
+
+import sqlite3, time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+GRAPH_DB   = "follow_graph.sqlite"
+EDGE_TYPES = ("follower", "following")   # follower: user sigue a owner · following: owner sigue a user
+BATCH      = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id       INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS edges (
+    owner_id   INTEGER NOT NULL,
+    type       TEXT    NOT NULL,
+    user_id    INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen  INTEGER NOT NULL,
+    pos        INTEGER,
+    PRIMARY KEY (owner_id, type, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_by_user ON edges(user_id, type);
+CREATE TABLE IF NOT EXISTS crawls (
+    id       INTEGER PRIMARY KEY,
+    owner_id INTEGER NOT NULL,
+    type     TEXT    NOT NULL,
+    ts       INTEGER NOT NULL,
+    n        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS crawls_by_owner ON crawls(owner_id, type, ts);
+"""
+
+def edge_type(which: str) -> str:
+    """Acepta 'followers'/'following' (nombres de las listas) o el tipo de arista."""
+    t = {"followers": "follower"}.get(which, which)
+    if t not in EDGE_TYPES:
+        raise ValueError(f"tipo de arista inválido: {which}")
+    return t
+
+class GraphStore:
+    def __init__(self, path: str = GRAPH_DB):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # bases creadas antes de guardar el orden del dialog
+        if "pos" not in {r[1] for r in self.db.execute("PRAGMA table_info(edges)")}:
+            self.db.execute("ALTER TABLE edges ADD COLUMN pos INTEGER")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    # ---------- internado de usernames ----------
+    def user_id(self, username: str, create: bool = True) -> Optional[int]:
+        row = self.db.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        return self.db.execute("INSERT INTO users(username) VALUES (?)", (username,)).lastrowid
+
+    # ---------- crawls ----------
+    def crawl_times(self, owner: str, which: str) -> List[int]:
+        oid = self.user_id(owner, create=False)
+        if oid is None:
+            return []
+        rows = self.db.execute(
+            "SELECT ts FROM crawls WHERE owner_id=? AND type=? ORDER BY ts DESC", (oid, edge_type(which))
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def _last_ts(self, owner_id: int, t: str) -> int:
+        row = self.db.execute("SELECT MAX(ts) FROM crawls WHERE owner_id=? AND type=?", (owner_id, t)).fetchone()
+        return row[0] or 0
+
+    def _next_ts(self, owner_id: int, t: str, ts: Optional[int]) -> int:
+        # ts estrictamente creciente por (owner, type): dos crawls en el mismo segundo no se pisan
+        return max(int(ts or time.time()), self._last_ts(owner_id, t) + 1)
+
+    def record_crawl(self, owner: str, which: str, users: Iterable[str], ts: Optional[int] = None) -> int:
+        """
+        Registra una lista completa (followers o following) de `owner`, en el
+        orden del dialog. Aristas nuevas -> first_seen=last_seen=ts; existentes ->
+        solo last_seen=ts (si no estaban en el crawl anterior, vuelven como alta:
+        first_seen=ts). Las que no aparecen conservan su last_seen anterior
+        (= bajas). Devuelve el ts del crawl.
+        """
+        t = edge_type(which)
+        with self.db:
+            oid = self.user_id(owner)
+            prev = self._last_ts(oid, t)
+            ts = self._next_ts(oid, t, ts)
+            n = self._upsert_all(oid, t, users, ts, prev)
+            self.db.execute("INSERT INTO crawls(owner_id, type, ts, n) VALUES (?,?,?,?)", (oid, t, ts, n))
+        return ts
+
+    def record_incremental(self, owner: str, which: str, scanned: Iterable[str], horizon: int,
+                           ts: Optional[int] = None) -> int:
+        """
+        Registra un crawl parcial: `scanned` es el prefijo de la lista (orden del
+        dialog) hasta la racha de usernames conocidos y `horizon` la mayor pos
+        previa vista en ese prefijo.
+          - scanned -> upsert con pos 0..k-1
+          - previos con pos <= horizon que no aparecieron -> bajas
+          - previos con pos > horizon (la cola no recorrida) -> se asumen vigentes:
+            last_seen=ts y pos desplazada detrás del prefijo
+        Solo vale si el scroll cortó por la racha de conocidos; si llegó al final
+        de la lista, lo recorrido es completo y va por record_crawl.
+        """
+        t = edge_type(which)
+        with self.db:
+            oid = self.user_id(owner)
+            prev = self._last_ts(oid, t)
+            ts = self._next_ts(oid, t, ts)
+            k = self._upsert_all(oid, t, scanned, ts, prev)
+            self.db.execute(
+                "UPDATE edges SET last_seen=?, pos=pos+? "
+                "WHERE owner_id=? AND type=? AND last_seen=? AND pos>?",
+                (ts, k - horizon - 1, oid, t, prev, horizon),
+            )
+            n = self.db.execute(
+                "SELECT COUNT(*) FROM edges WHERE owner_id=? AND type=? AND last_seen=?", (oid, t, ts)
+            ).fetchone()[0]
+            self.db.execute("INSERT INTO crawls(owner_id, type, ts, n) VALUES (?,?,?,?)", (oid, t, ts, n))
+        return ts
+
+    def _upsert_all(self, oid: int, t: str, users: Iterable[str], ts: int, prev: int) -> int:
+        n = 0
+        batch: List[str] = []
+        for u in users:
+            batch.append(u)
+            if len(batch) >= BATCH:
+                n += self._upsert(oid, t, batch, ts, prev, n)
+                batch = []
+        return n + self._upsert(oid, t, batch, ts, prev, n)
+
+    def _upsert(self, oid: int, t: str, users: List[str], ts: int, prev: int, start: int) -> int:
+        # una arista que no estaba en el crawl anterior (`prev`) es una re-alta: first_seen=ts
+        if not users:
+            return 0
+        self.db.executemany("INSERT OR IGNORE INTO users(username) VALUES (?)", ((u,) for u in users))
+        self.db.executemany(
+            "INSERT INTO edges(owner_id, type, user_id, first_seen, last_seen, pos) "
+            "VALUES (?, ?, (SELECT id FROM users WHERE username=?), ?, ?, ?) "
+            "ON CONFLICT(owner_id, type, user_id) DO UPDATE SET last_seen=excluded.last_seen, pos=excluded.pos, "
+            "first_seen=CASE WHEN edges.last_seen < ? THEN excluded.first_seen ELSE edges.first_seen END",
+            ((oid, t, u, ts, ts, start + i, prev) for i, u in enumerate(users)),
+        )
+        return len(users)
+
+    # ---------- consultas ----------
+    def current(self, owner: str, which: str) -> List[str]:
+        """Lista vigente (la del último crawl), ordenada."""
+        times = self.crawl_times(owner, which)
+        if not times:
+            return []
+        rows = self.db.execute(
+            "SELECT u.username FROM edges e JOIN users u ON u.id=e.user_id "
+            "WHERE e.owner_id=? AND e.type=? AND e.last_seen=? ORDER BY u.username",
+            (self.user_id(owner, create=False), edge_type(which), times[0]),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def iter_current(self, owner: str, which: str) -> Iterator[str]:
+        """Como current() pero en streaming (cursor), sin cargar la lista en memoria."""
+        times = self.crawl_times(owner, which)
+        if not times:
+            return
+        cur = self.db.execute(
+            "SELECT u.username FROM edges e JOIN users u ON u.id=e.user_id "
+            "WHERE e.owner_id=? AND e.type=? AND e.last_seen=? ORDER BY u.username",
+            (self.user_id(owner, create=False), edge_type(which), times[0]),
+        )
+        for (u,) in cur:
+            yield u
+
+    def can_incremental(self, owner: str, which: str) -> bool:
+        """Hay un crawl previo y todas sus aristas vigentes tienen posición."""
+        times = self.crawl_times(owner, which)
+        if not times:
+            return False
+        row = self.db.execute(
+            "SELECT 1 FROM edges WHERE owner_id=? AND type=? AND last_seen=? AND pos IS NULL LIMIT 1",
+            (self.user_id(owner, create=False), edge_type(which), times[0]),
+        ).fetchone()
+        return row is None
+
+    def known_positions(self, owner: str, which: str, users: List[str]) -> Dict[str, int]:
+        """{username: pos} de los `users` que están en la lista vigente."""
+        times = self.crawl_times(owner, which)
+        if not times or not users:
+            return {}
+        oid, t = self.user_id(owner, create=False), edge_type(which)
+        out: Dict[str, int] = {}
+        for i in range(0, len(users), 500):
+            chunk = users[i:i+500]
+            rows = self.db.execute(
+                "SELECT u.username, e.pos FROM edges e JOIN users u ON u.id=e.user_id "
+                f"WHERE e.owner_id=? AND e.type=? AND e.last_seen=? AND u.username IN ({','.join('?' * len(chunk))})",
+                (oid, t, times[0], *chunk),
+            ).fetchall()
+            out.update(rows)
+        return out
+
+    def changes_since_last(self, owner: str, which: str) -> Tuple[List[str], List[str]]:
+        """(altas, bajas) entre los dos últimos crawls de esa lista."""
+        times = self.crawl_times(owner, which)
+        if not times:
+            return [], []
+        oid, t = self.user_id(owner, create=False), edge_type(which)
+        last = times[0]
+        prev = times[1] if len(times) > 1 else 0
+        added = self.db.execute(
+            "SELECT u.username FROM edges e JOIN users u ON u.id=e.user_id "
+            "WHERE e.owner_id=? AND e.type=? AND e.first_seen=? ORDER BY u.username",
+            (oid, t, last),
+        ).fetchall()
+        removed = self.db.execute(
+            "SELECT u.username FROM edges e JOIN users u ON u.id=e.user_id "
+            "WHERE e.owner_id=? AND e.type=? AND e.last_seen=? ORDER BY u.username",
+            (oid, t, prev),
+        ).fetchall() if prev else []
+        return [r[0] for r in added], [r[0] for r in removed]
+
+    def who_follows(self, username: str) -> List[str]:
+        """
+        Quién sigue a `username` según lo crawleado:
+          - owners cuya lista 'following' vigente lo incluye,
+          - la lista 'followers' vigente del propio username.
+        """
+        uid = self.user_id(username, create=False)
+        if uid is None:
+            return []
+        latest = ("SELECT owner_id, type, MAX(ts) AS ts FROM crawls GROUP BY owner_id, type")
+        rows = self.db.execute(
+            f"SELECT o.username FROM edges e JOIN ({latest}) c "
+            "  ON c.owner_id=e.owner_id AND c.type=e.type AND c.ts=e.last_seen "
+            "JOIN users o ON o.id=e.owner_id "
+            "WHERE e.user_id=? AND e.type='following' "
+            "UNION "
+            f"SELECT u.username FROM edges e JOIN ({latest}) c "
+            "  ON c.owner_id=e.owner_id AND c.type=e.type AND c.ts=e.last_seen "
+            "JOIN users u ON u.id=e.user_id "
+            "WHERE e.owner_id=? AND e.type='follower' "
+            "ORDER BY 1",
+            (uid, uid),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Consultas sobre el grafo de seguidores en SQLite")
+    p.add_argument("--db", default=GRAPH_DB, help="Ruta de la base SQLite")
+    p.add_argument("--who-follows", help="Lista quién sigue a este usuario")
+    p.add_argument("--changes", help="Altas/bajas del último crawl de este usuario")
+    p.add_argument("--type", default="followers", choices=["followers", "following"], help="Lista para --changes")
+    args = p.parse_args()
+
+    with GraphStore(args.db) as store:
+        if args.who_follows:
+            for u in store.who_follows(args.who_follows):
+                print(u)
+        if args.changes:
+            added, removed = store.changes_since_last(args.changes, args.type)
+            print(f"➕ altas: {len(added)}")
+            for u in added:
+                print(f"  + {u}")
+            print(f"➖ bajas: {len(removed)}")
+            for u in removed:
+                print(f"  - {u}")
@@ -0,0 +1,321 @@
+# ig_harvest.py
+# Cosecha de posts en dos etapas (sin abrir el modal de cada post):
+#   1) el grid se scrollea y se leen TODOS los hrefs de posts en una evaluación;
+#   2) cada post se resuelve a su autor:
+#        - directo del grid, si el href ya trae el usuario (/<user>/p/<code>/) o si
+#          el JSON que cargó el grid (api/graphql) trae code + user.username;
+#        - si no, en un pool de páginas de trabajo que navegan al post en paralelo.
+# Así los posts por minuto no dependen de la animación/cierre del modal.
+#
+# Uso desde un crawler:
+#   stats = await harvest_grid(ctx, page, url, workers=3, delay_ms=300,
+#                              on_user=lambda user, post_url, source: ...,
+#                              should_stop=lambda: len(users) >= max_users)
+
+import asyncio, re, random
+from collections import Counter
+from typing import Callable, Dict, Set, Tuple
+from playwright.async_api import TimeoutError as PWTimeout
+
+WORKERS      = 3        # páginas resolviendo posts en paralelo
+IDLE_CYCLES  = 6        # scrolls seguidos sin posts nuevos para dar el grid por terminado
+QUEUE_AHEAD  = 8        # posts pendientes por worker antes de frenar el scroll
+POST_TIMEOUT = 45000
+
+POST_SEL      = 'a[href*="/p/"], a[href*="/reel/"], a[href*="/tv/"]'
+POST_HREF_RE  = re.compile(r"^(?:https?://(?:www\.)?instagram\.com)?/(?:([A-Za-z0-9._]+)/)?(?:p|reel|tv)/([A-Za-z0-9_-]+)")
+GRID_API_HINTS = ("/api/v1/", "/graphql")
+
+# todos los hrefs de posts del DOM, en orden, en un solo round-trip
+GRID_HREFS_JS = """
+(sel) => Array.from(document.querySelectorAll(sel), a => a.getAttribute("href")).filter(Boolean)
+"""
+
+def rand(a,b): return a + random.random()*(b-a)
+
+def parse_post_href(href: str) -> Tuple[str|None, str|None]:
+    """(shortcode, usuario si el href lo trae) de un link de post."""
+    m = POST_HREF_RE.match(href or "")
+    if not m:
+        return None, None
+    user = m.group(1)
+    if user in ("explore", "stories", "reels"):
+        user = None
+    return m.group(2), user
+
+def post_url(code: str) -> str:
+    return f"https://www.instagram.com/p/{code}/"
+
+def find_post_authors(data, out: Dict[str, str]):
+    """Junta code -> username de cualquier media (code/shortcode + user/owner) dentro del payload."""
+    stack = [data]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            code = cur.get("code") or cur.get("shortcode")
+            owner = cur.get("user") or cur.get("owner")
+            if isinstance(code, str) and isinstance(owner, dict) and owner.get("username"):
+                out.setdefault(code, owner["username"])
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+
+class GridAuthorCapture:
+    """Escucha el JSON que carga el grid y arma un mapa shortcode -> autor."""
+
+    def __init__(self, page):
+        self.page = page
+        self.authors: Dict[str, str] = {}
+
+    async def _on_response(self, resp):
+        try:
+            if resp.request.resource_type not in ("xhr", "fetch"):
+                return
+            if not any(h in resp.url for h in GRID_API_HINTS):
+                return
+            data = await resp.json()
+        except:  # noqa
+            return
+        find_post_authors(data, self.authors)
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def detach(self):
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except:  # noqa
+            pass
+
+# ---------- Autor de un post (modal o página) ----------
+# Extracción del @ en UN round-trip: las estrategias de DOM corren en la página y,
+# solo si fallan, vuelve el HTML para los regex de respaldo (compilados acá abajo).
+# `root` es el modal (Locator.evaluate) o nada (page.evaluate → todo el documento).
+USERNAME_JS = r"""
+(root) => {
+  const scope = root || document;
+  const USER = /^[A-Za-z0-9._]{2,}$/;
+  const a = scope.querySelector('header a[href^="/"]:not([href*="/p/"]):not([href*="/reel/"]):not([href*="/tv/"])');
+  if (a) {
+    const m = (a.getAttribute("href") || "").match(/^\/([A-Za-z0-9._]+)\/?$/);
+    if (m) return {user: m[1], strategy: "header_href"};
+    const t = (a.textContent || "").trim();
+    if (USER.test(t)) return {user: t, strategy: "header_text"};
+  }
+  for (const an of scope.querySelectorAll('a[role="link"]')) {
+    const t = (an.textContent || "").trim();
+    if (USER.test(t)) return {user: t, strategy: "link_text"};
+  }
+  return {user: null, strategy: null, html: root ? root.innerHTML : document.documentElement.outerHTML};
+}
+"""
+JSON_USERNAME_RE = re.compile(r'"username"\s*:\s*"([A-Za-z0-9._]+)"')
+PROFILE_LINK_RE  = re.compile(r"instagram\.com/([A-Za-z0-9._]+)/")
+
+# aciertos por estrategia en el proceso (header_href, header_text, link_text, json, html_link, miss)
+EXTRACT_STATS: Counter = Counter()
+
+async def extract_username(target) -> Tuple[str|None, str]:
+    """(usuario, estrategia) de un modal (Locator) o de la página de un post (Page)."""
+    try:
+        res = await target.evaluate(USERNAME_JS)
+    except Exception:
+        res = {}
+    user, strategy = res.get("user"), res.get("strategy")
+    if not user:
+        html = res.get("html") or ""
+        for strategy, rx in (("json", JSON_USERNAME_RE), ("html_link", PROFILE_LINK_RE)):
+            m = rx.search(html)
+            if m:
+                user = m.group(1)
+                break
+        else:
+            strategy = "miss"
+    EXTRACT_STATS[strategy] += 1
+    return user, strategy
+
+def extract_summary(since: Counter|None = None) -> str:
+    """Aciertos por estrategia (desde `since`, una copia previa de EXTRACT_STATS)."""
+    c = EXTRACT_STATS - since if since is not None else EXTRACT_STATS
+    total = sum(c.values())
+    if not total:
+        return "🔎 Extracción del @: sin posts"
+    parts = " · ".join(f"{k} {v} ({v / total * 100:.0f}%)" for k, v in c.most_common())
+    return f"🔎 Extracción del @ ({total} posts): {parts}"
+
+async def extract_username_from_post_page(post_page):
+    """Extrae @ desde la PÁGINA del post (más robusto que modal)."""
+    return (await extract_username(post_page))[0]
+
+class PostResolverPool:
+    """
+    N páginas de larga vida que consumen URLs de posts de una cola y navegan en
+    el lugar (sin abrir/cerrar pestañas). `on_result(url, user|None)` por post.
+    `lookup(url)` se consulta antes de navegar (p.ej. autores que ya llegaron del grid).
+    """
+
+    def __init__(self, ctx, workers: int = WORKERS, delay_ms: int = 300,
+                 on_result: Callable[[str, str|None], None]|None = None,
+                 lookup: Callable[[str], str|None]|None = None):
+        self.ctx, self.workers, self.delay_ms = ctx, max(1, workers), delay_ms
+        self.on_result, self.lookup = on_result, lookup
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.tasks = []
+        self.pending = 0     # encolados + en curso
+        self.navigated = 0
+
+    async def start(self):
+        pages = [await self.ctx.new_page() for _ in range(self.workers)]
+        self.tasks = [asyncio.create_task(self._worker(p)) for p in pages]
+        return self
+
+    def put(self, url: str):
+        self.pending += 1
+        self.queue.put_nowait(url)
+
+    def backlog(self) -> int:
+        return self.queue.qsize()
+
+    async def _worker(self, page):
+        try:
+            while True:
+                url = await self.queue.get()
+                try:
+                    user = self.lookup(url) if self.lookup else None
+                    if not user:
+                        user = await self.resolve(page, url)
+                    if self.on_result:
+                        self.on_result(url, user)
+                except Exception as e:
+                    print(f"  ⚠️ {url}: {e}")
+                    if self.on_result:
+                        self.on_result(url, None)
+                finally:
+                    self.pending -= 1
+        finally:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    async def resolve(self, page, url: str) -> str|None:
+        self.navigated += 1
+        await page.goto(url, wait_until="domcontentloaded", timeout=POST_TIMEOUT)
+        if "login" in page.url:
+            print("ℹ️ Login wall en post. Inicia sesión una vez en la sesión persistente y reintenta.")
+            return None
+        try:
+            await page.wait_for_selector('header, article', timeout=8000)
+        except PWTimeout:
+            pass
+        user = await extract_username_from_post_page(page)
+        await asyncio.sleep(self.delay_ms/1000.0 * rand(0.8, 1.2))
+        return user
+
+    async def drain(self, should_stop: Callable[[], bool] = lambda: False):
+        """Espera a que se resuelva todo lo encolado (o a que pidan parar)."""
+        while self.pending and not should_stop():
+            await asyncio.sleep(0.2)
+
+    async def close(self):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+async def harvest_grid(ctx, page, url: str, workers: int = WORKERS, delay_ms: int = 300,
+                       on_user: Callable[[str, str, str], None]|None = None,
+                       should_stop: Callable[[], bool] = lambda: False,
+                       visited: Set[str]|None = None, navigate: bool = True, cache=None) -> Dict:
+    """
+    Navega `page` al grid `url` y lo cosecha en dos etapas. `on_user(user, post_url, source)`
+    con source "grid" o "page". `visited` (un set o un ig_seen_posts.SeenPosts) recibe cada
+    post recién cuando se encontró su autor: lo que estaba en cola al cortar, o falló, se
+    reintenta la próxima vez.
+    Con navigate=False se cosecha el grid que `page` ya tiene cargado.
+    `cache` (ig_author_cache.PostAuthorCache) se consulta antes de encolar un post; sus
+    hits no pasan por el navegador. Para posts ya vistos en corridas anteriores, la caché
+    permite igual emitir el autor (source "seen") sin abrirlos.
+    """
+    visited = visited if visited is not None else set()
+    inflight: Set[str] = set()
+    failed: Set[str] = set()   # sin autor en esta corrida: no se reencolan, pero tampoco quedan como vistos
+    stats = {"posts": 0, "grid": 0, "cache": 0, "page": 0, "miss": 0, "seen": 0}
+    capture = GridAuthorCapture(page).attach()
+
+    def found(user: str|None, url_: str, source: str, remember: bool = True):
+        inflight.discard(url_)
+        if not user:
+            # login wall, timeout o error: la próxima corrida lo vuelve a intentar
+            failed.add(url_)
+            stats["miss"] += 1
+            return
+        visited.add(url_)
+        stats[source] += 1
+        if cache is not None and remember and source != "cache":
+            cache.put(url_, user)
+        if on_user:
+            on_user(user, url_, source)
+
+    pool = PostResolverPool(ctx, workers, delay_ms,
+                            on_result=lambda u, user: found(user, u, "page"),
+                            lookup=lambda u: capture.authors.get(parse_post_href(u)[0] or ""))
+    try:
+        if navigate:
+            await page.goto(url, wait_until="domcontentloaded")
+            await page.wait_for_selector(POST_SEL, timeout=10000)
+        await pool.start()
+        idle, prev = 0, set()
+        while not should_stop():
+            # progreso = el grid mostró hrefs distintos (aunque todos ya estuvieran vistos de antes)
+            hrefs = await page.evaluate(GRID_HREFS_JS, POST_SEL)
+            shown_before, prev = prev, set(hrefs)
+            grew = not shown_before.issuperset(hrefs)
+            for href in hrefs:
+                code, user = parse_post_href(href)
+                if not code:
+                    continue
+                purl = post_url(code)
+                if purl in inflight or purl in failed:
+                    continue
+                if purl in visited:
+                    # ya procesado: el autor sale del href o de la caché, sin navegador
+                    if href not in shown_before:
+                        user = user or (cache.get(code) if cache is not None else None)
+                        if user:
+                            stats["seen"] += 1
+                            if on_user:
+                                on_user(user, purl, "seen")
+                    continue
+                stats["posts"] += 1
+                in_href = bool(user)   # el href ya trae el autor: no hace falta cachearlo
+                user, source = user or capture.authors.get(code), "grid"
+                if not user and cache is not None:
+                    user, source = cache.get(code), "cache"
+                if user:
+                    found(user, purl, source, remember=not in_href)
+                else:
+                    inflight.add(purl)
+                    pool.put(purl)
+                if should_stop():
+                    break
+
+            idle = 0 if grew else idle + 1
+            if idle >= IDLE_CYCLES:
+                print("ℹ️ No aparecen más posts nuevos en el grid. Fin.")
+                break
+            # el scroll no se adelanta demasiado a los workers
+            while pool.backlog() > pool.workers * QUEUE_AHEAD and not should_stop():
+                await asyncio.sleep(0.2)
+            await page.mouse.wheel(0, 1600 if idle else 900)
+            await asyncio.sleep(rand(0.6, 1.2))
+
+        # lo encolado se resuelve salvo que nos hayan pedido parar
+        await pool.drain(should_stop)
+    finally:
+        capture.detach()
+        await pool.close()
+    print(f"🌾 Cosecha: {stats['posts']} posts · autor desde el grid {stats['grid']} · de la caché {stats['cache']} · "
+          f"desde la página {stats['page']} · sin autor {stats['miss']} · ya vistos con autor conocido {stats['seen']}")
+    return stats
@@ -0,0 +1,146 @@
+# ig_lightweight.py
+# Modo liviano para los crawlers: bloquea imágenes, video y fuentes (por tipo de
+# recurso y por patrón de URL) en todo el contexto de Playwright. Para sacar
+# usernames, links o bios no hace falta ninguna miniatura ni preview de reel.
+#
+# Uso dentro de un crawler:
+#   rf = await ResourceFilter(enabled=True).install(ctx)
+#   ...
+#   rf.report("ig_hashtag_users", units=len(visited))
+#
+# Cada corrida deja sus métricas en ig_lightweight_stats.json; una corrida con
+# --no-lightweight queda como referencia y las siguientes informan el ahorro
+# (respuestas, bytes y tiempo de carga por unidad de trabajo) contra ella.
+# Los bytes salen del content-length: las respuestas chunked no lo traen, así
+# que son un mínimo y se informa cuántas respuestas quedaron sin tamaño.
+
+import json, re, time
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+
+BLOCK_TYPES  = {"image", "media", "font"}
+# media que llega como fetch/xhr (segmentos de reels) o sin tipo claro
+BLOCK_URL_RE = re.compile(r"\.(?:jpe?g|png|gif|webp|avif|heic|mp4|m4s|m4a|webm|woff2?|ttf|otf)(?:[?#]|$)", re.I)
+STATS_FILE   = "ig_lightweight_stats.json"
+
+def should_block(resource_type: str, url: str) -> bool:
+    if resource_type in BLOCK_TYPES:
+        return True
+    if resource_type in ("document", "script", "stylesheet"):
+        return False
+    return bool(BLOCK_URL_RE.search(url.split("?")[0]))
+
+class ResourceFilter:
+    """
+    Filtro de recursos + medición. Con enabled=False no intercepta nada (solo
+    mide), así la misma corrida sirve de referencia.
+    """
+
+    def __init__(self, enabled: bool = True, stats_file: str = STATS_FILE):
+        self.enabled = enabled
+        self.stats_file = stats_file
+        self.blocked: Counter = Counter()
+        self.bytes_in = 0          # solo respuestas con content-length (mínimo)
+        self.responses = 0
+        self.unsized = 0           # respuestas sin content-length (chunked, streaming)
+        self.load_ms = []
+        self._nav_start: Dict[object, float] = {}
+        self.t0 = time.monotonic()
+
+    async def install(self, ctx):
+        if self.enabled:
+            await ctx.route("**/*", self._route)
+        ctx.on("response", self._on_response)
+        ctx.on("page", self._watch)
+        for p in ctx.pages:
+            self._watch(p)
+        return self
+
+    async def _route(self, route):
+        req = route.request
+        if should_block(req.resource_type, req.url):
+            self.blocked[req.resource_type] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_response(self, resp):
+        self.responses += 1
+        try:
+            self.bytes_in += int(resp.headers["content-length"])
+        except (KeyError, TypeError, ValueError):
+            self.unsized += 1
+
+    # ---------- tiempo de carga (navegación del frame principal -> load) ----------
+    def _watch(self, page):
+        def on_request(req):
+            try:
+                if req.is_navigation_request() and req.frame == page.main_frame:
+                    self._nav_start[page] = time.monotonic()
+            except Exception:
+                pass
+
+        def on_load(_):
+            t = self._nav_start.pop(page, None)
+            if t is not None:
+                self.load_ms.append((time.monotonic() - t) * 1000.0)
+
+        page.on("request", on_request)
+        page.on("load", on_load)
+        page.on("close", lambda _: self._nav_start.pop(page, None))
+
+    # ---------- reporte ----------
+    def summary(self, units: int) -> Dict:
+        units = max(1, units)
+        return {
+            "lightweight": self.enabled,
+            "units": units,
+            "blocked": dict(self.blocked),
+            "bytes_in": self.bytes_in,
+            "bytes_per_unit": self.bytes_in / units,
+            "responses": self.responses,
+            "responses_per_unit": self.responses / units,
+            "unsized": self.unsized,
+            "avg_load_ms": (sum(self.load_ms) / len(self.load_ms)) if self.load_ms else None,
+            "elapsed_s": time.monotonic() - self.t0,
+            "ts": int(time.time()),
+        }
+
+    def report(self, label: str, units: int) -> Dict:
+        """Imprime métricas de la corrida y el ahorro contra la última corrida sin filtro."""
+        cur = self.summary(units)
+        path = Path(self.stats_file)
+        try:
+            stats = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        except ValueError:
+            stats = {}
+        entry = stats.setdefault(label, {})
+        entry["lightweight" if self.enabled else "baseline"] = cur
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(stats, indent=1), encoding="utf-8")
+        tmp.replace(path)
+
+        blocked = ", ".join(f"{k} {v}" for k, v in sorted(self.blocked.items())) or "nada"
+        load = f"{cur['avg_load_ms']:.0f} ms" if cur["avg_load_ms"] is not None else "-"
+        print(f"🪶 {'Modo liviano' if self.enabled else 'Sin filtro'}: bloqueados {sum(self.blocked.values())} ({blocked}) · "
+              f"{self.responses} respuestas ({cur['responses_per_unit']:.0f}/unidad) · "
+              f"descargados ≥{self.bytes_in/1e6:.1f} MB (≥{cur['bytes_per_unit']/1e3:.0f} KB/unidad; "
+              f"{self.unsized} respuestas sin tamaño) · carga media {load}")
+
+        base = entry.get("baseline")
+        if self.enabled and base:
+            msg = "   vs. referencia sin filtro:"
+            if base.get("responses_per_unit"):
+                saved_n = base["responses_per_unit"] - cur["responses_per_unit"]
+                msg += f" {saved_n:+.0f} respuestas/unidad ({saved_n / base['responses_per_unit'] * 100.0:.0f}%) ·"
+            saved = base["bytes_per_unit"] - cur["bytes_per_unit"]
+            pct = (saved / base["bytes_per_unit"] * 100.0) if base["bytes_per_unit"] else 0.0
+            # comparación de mínimos: orientativa si alguna corrida tuvo muchas respuestas sin tamaño
+            msg += f" {saved/1e3:+.0f} KB/unidad con tamaño conocido ({pct:.0f}%)"
+            if base.get("avg_load_ms") and cur["avg_load_ms"] is not None:
+                msg += f" · carga {cur['avg_load_ms'] - base['avg_load_ms']:+.0f} ms"
+            print(msg)
+        elif self.enabled:
+            print("   (sin referencia: corre una vez con --no-lightweight para medir el ahorro)")
+        return cur
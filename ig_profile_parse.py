@@ -0,0 +1,66 @@
+# ig_profile_parse.py
+# Parseo puro (sin navegador) de bio + urls de un perfil: desde el HTML serializado
+# o desde el objeto de usuario del JSON interceptado. Lo usan IGC.py en vivo y
+# bench_profile_extraction.py sobre fixtures, sin necesitar playwright.
+
+import re
+from typing import Dict, Set, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+URL_JSON_RE   = re.compile(r'"(?:external_url|url)"\s*:\s*"(https?://[^"]+)"')
+BIO_RE        = re.compile(r'"biography"\s*:\s*"(.*?)"', re.S)
+
+def unshim_instagram(url: str) -> str:
+    """Si el link viene desde l.instagram.com, devuelve el destino real (parámetro u=)."""
+    try:
+        p = urlparse(url)
+        if p.hostname and p.hostname.lower() == "l.instagram.com":
+            qs = parse_qs(p.query)
+            if "u" in qs and qs["u"]:
+                return unquote(qs["u"][0])
+    except:  # noqa
+        pass
+    return url
+
+def norm_url(u: str) -> str:
+    if not u: return ""
+    u = u.strip().replace("\\u0026", "&").replace("\\/", "/")
+    u = unshim_instagram(u)
+    # normaliza esquema
+    if u.startswith("//"):
+        u = "https:" + u
+    return u
+
+def profile_from_html(html: str) -> Tuple[str, Set[str]]:
+    """Camino clásico: regex sobre el HTML serializado (bio + urls del JSON embebido)."""
+    bio = ""
+    m = BIO_RE.search(html)
+    if m:
+        bio = m.group(1)
+        bio = bio.encode("utf-8").decode("unicode_escape").replace("\\n", " ").strip()
+    links = set(norm_url(u) for u in URL_JSON_RE.findall(html) if u)
+    return bio, links
+
+def find_user_node(data, user: str) -> Dict|None:
+    """Busca en un payload JSON el objeto del usuario (username + biography/external_url)."""
+    user = user.lower()
+    stack = [data]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            if str(cur.get("username", "")).lower() == user and (
+                    "biography" in cur or "external_url" in cur or "bio_links" in cur):
+                return cur
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+    return None
+
+def profile_from_payload(node: Dict) -> Tuple[str, Set[str]]:
+    """Bio + urls desde el objeto de usuario ya parseado (sin HTML ni regex)."""
+    bio = (node.get("biography") or "").replace("\n", " ").strip()
+    urls = [node.get("external_url") or ""]
+    for bl in node.get("bio_links") or []:
+        if isinstance(bl, dict):
+            urls += [bl.get("url") or "", bl.get("lynx_url") or ""]
+    return bio, set(norm_url(u) for u in urls if u)
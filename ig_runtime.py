@@ -0,0 +1,157 @@
+# ig_runtime.py
+# Runtime compartido: UN solo Chromium por proceso y contextos livianos (headless)
+# que reutilizan la sesión guardada en ./ig_profile (cookies + localStorage
+# exportados a storage_state.json). Así:
+#   - el arranque en frío del navegador se paga una vez, no por script,
+#   - varios crawlers pueden correr en el mismo proceso (un contexto cada uno),
+#   - ./ig_profile no queda bloqueado y no hace falta pantalla en el servidor.
+#
+# Uso desde código:
+#   async with IGRuntime() as rt:
+#       await asyncio.gather(
+#           ig_hashtag_users.main("n8n", runtime=rt),
+#           IGC.main("users.txt", runtime=rt),
+#       )
+#
+# Desde la CLI de cada crawler: --headless.
+# Login: si ./ig_profile no tiene sesión todavía, se abre UNA vez una ventana
+# visible para iniciar sesión. En un servidor sin pantalla, copia
+# storage_state.json desde una máquina donde ya te hayas logueado.
+# Si la sesión vence a mitad de un crawl sobre el runtime no hay ventana donde
+# loguearse: login_wall() levanta LoginRequired (el daemon marca el job como fallido).
+
+import asyncio, weakref
+from contextlib import asynccontextmanager
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+USER_DATA   = "./ig_profile"
+STATE_FILE  = "storage_state.json"          # dentro de USER_DATA
+VIEWPORT    = {"width": 1280, "height": 900}
+USER_AGENT  = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+               "AppleWebKit/537.36 (KHTML, like Gecko) "
+               "Chrome/124.0 Safari/537.36")
+
+_runtime_contexts = weakref.WeakSet()   # contextos creados sobre un IGRuntime (sin ventana)
+
+class LoginRequired(RuntimeError):
+    """Instagram pidió login en un contexto del runtime compartido."""
+
+async def login_wall(page):
+    """
+    Muro de login. En un contexto del runtime compartido falla con LoginRequired;
+    en el modo clásico (ventana visible) espera ENTER sin frenar el event loop.
+    """
+    if page.context in _runtime_contexts:
+        raise LoginRequired(f"Instagram pidió login ({page.url}); renová la sesión de {USER_DATA}")
+    print("➡️ Inicia sesión en la ventana y presiona ENTER aquí…")
+    await asyncio.to_thread(input)
+
+def has_session(state: dict) -> bool:
+    return any(c.get("name") == "sessionid" and c.get("value") for c in state.get("cookies", []))
+
+class IGRuntime:
+    def __init__(self, user_data: str = USER_DATA, headless: bool = True):
+        self.user_data = user_data
+        self.headless = headless
+        self.state_path = Path(user_data) / STATE_FILE
+        self.pw = None
+        self.browser = None
+        self._state_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self.pw = await async_playwright().start()
+        if not self.state_path.exists():
+            await self.export_session()
+        self.browser = await self.pw.chromium.launch(headless=self.headless)
+        return self
+
+    async def export_session(self):
+        """Vuelca la sesión del perfil persistente a storage_state.json (login manual si hace falta)."""
+        Path(self.user_data).mkdir(parents=True, exist_ok=True)
+        ctx = await self.pw.chromium.launch_persistent_context(
+            self.user_data, headless=self.headless, viewport=VIEWPORT, user_agent=USER_AGENT)
+        try:
+            state = await ctx.storage_state()
+            if not has_session(state):
+                await ctx.close()
+                ctx = await self.pw.chromium.launch_persistent_context(
+                    self.user_data, headless=False, viewport=VIEWPORT, user_agent=USER_AGENT)
+                page = await ctx.new_page()
+                await page.goto("https://www.instagram.com/accounts/login/", wait_until="domcontentloaded")
+                print("➡️ Inicia sesión en la ventana y presiona ENTER aquí…")
+                await asyncio.to_thread(input)
+            await ctx.storage_state(path=str(self.state_path))
+        finally:
+            await ctx.close()
+
+    async def new_context(self, viewport: dict = VIEWPORT, user_agent: str = USER_AGENT):
+        return await self.browser.new_context(
+            storage_state=str(self.state_path), viewport=viewport, user_agent=user_agent)
+
+    async def save_state(self, ctx):
+        """Las cookies rotan: al cerrar un contexto se guarda su estado para los siguientes."""
+        async with self._state_lock:
+            try:
+                state = await ctx.storage_state()
+            except Exception:
+                return
+            if has_session(state):
+                tmp = self.state_path.with_suffix(".tmp")
+                await ctx.storage_state(path=str(tmp))
+                tmp.replace(self.state_path)
+
+    async def close(self):
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self.pw:
+            await self.pw.stop()
+            self.pw = None
+
+async def _close_quietly(ctx):
+    try:
+        await ctx.close()
+    except Exception:
+        pass
+
+@asynccontextmanager
+async def context_scope(runtime: IGRuntime|None = None, user_data: str = USER_DATA, headless: bool = False,
+                        viewport: dict = VIEWPORT, user_agent: str = USER_AGENT):
+    """
+    Contexto para un crawler. Con `runtime`: contexto nuevo sobre el navegador
+    compartido. Sin runtime: como siempre, su propio persistent context en user_data.
+    """
+    if runtime:
+        ctx = await runtime.new_context(viewport=viewport, user_agent=user_agent)
+        _runtime_contexts.add(ctx)
+        try:
+            yield ctx
+        finally:
+            await runtime.save_state(ctx)
+            await _close_quietly(ctx)
+    else:
+        Path(user_data).mkdir(parents=True, exist_ok=True)
+        async with async_playwright() as pw:
+            ctx = await pw.chromium.launch_persistent_context(
+                user_data, headless=headless, viewport=viewport, user_agent=user_agent)
+            try:
+                yield ctx
+            finally:
+                await _close_quietly(ctx)
+
+@asynccontextmanager
+async def runtime_scope(headless: bool, user_data: str = USER_DATA):
+    """Para las CLIs: con --headless arranca un IGRuntime; si no, None (modo clásico)."""
+    if not headless:
+        yield None
+        return
+    async with IGRuntime(user_data, headless=True) as rt:
+        yield rt
@@ -0,0 +1,188 @@
+# ig_seen_posts.py
+# Registro persistente de posts ya procesados, por shortcode, compartido entre
+# corridas y entre crawlers (hashtag, ubicación, grid de perfil).
+#
+# Es un Bloom filter escalable: memoria fija por capa (no crece con cada URL como
+# un set) y una tasa de falsos positivos acotada (SEEN_FP). Cuando una capa se llena
+# se agrega otra del doble de capacidad y con la mitad de FP, así la tasa total
+# queda por debajo de ~2×SEEN_FP aunque el crawl dure días.
+# Un falso positivo = un post nuevo que se saltea; nunca se repite un post visto.
+#
+# Uso:
+#   seen = SeenPosts.open()                # ig_seen_posts.bloom
+#   if url not in seen: ...; seen.add(url) # URL de post o shortcode
+#   seen.close()                           # guarda (une con lo que otros procesos guardaron)
+#
+# El guardado lee, une y reemplaza el archivo bajo un lock exclusivo (<archivo>.lock),
+# así dos procesos que guardan a la vez no se pisan los bits.
+
+import hashlib, math, os, re, struct, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+SEEN_FILE     = "ig_seen_posts.bloom"
+SEEN_CAPACITY = 1_000_000   # posts en la primera capa (~1.8 MB con FP 0.1%)
+SEEN_FP       = 0.001       # falsos positivos de la primera capa
+SAVE_EVERY_S  = 60          # guardado periódico durante el crawl
+
+MAGIC     = b"IGSEEN1\n"
+LAYER_HDR = struct.Struct("<QIQQ")   # bits, hashes, capacidad, cargados
+SHORTCODE_RE = re.compile(r"/(?:p|reel|tv)/([A-Za-z0-9_-]+)")
+
+def shortcode(key: str) -> str:
+    """Shortcode de una URL/href de post; si ya es un shortcode, tal cual."""
+    m = SHORTCODE_RE.search(key)
+    return m.group(1) if m else key.strip("/")
+
+class BloomLayer:
+    def __init__(self, capacity: int, fp: float, bits: int = 0, hashes: int = 0,
+                 count: int = 0, data: bytes|None = None):
+        self.capacity = capacity
+        self.m = bits or max(64, int(-capacity * math.log(fp) / (math.log(2) ** 2)))
+        self.k = hashes or max(1, round(self.m / capacity * math.log(2)))
+        self.count = count
+        self.bits = bytearray(data) if data is not None else bytearray((self.m + 7) // 8)
+
+    def _positions(self, h1: int, h2: int):
+        m = self.m
+        return ((h1 + i * h2) % m for i in range(self.k))
+
+    def __contains__(self, h) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(*h))
+
+    def add(self, h):
+        bits = self.bits
+        for p in self._positions(*h):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def same_shape(self, other: "BloomLayer") -> bool:
+        return (self.m, self.k, self.capacity) == (other.m, other.k, other.capacity)
+
+    def union(self, other: "BloomLayer"):
+        """OR de bits: el resultado contiene todo lo que tenían los dos."""
+        n = len(self.bits)
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(n, "little"))
+        self.count = max(self.count, other.count)
+
+@contextmanager
+def _file_lock(path: Path):
+    """Lock exclusivo entre procesos sobre `path` (fcntl en Linux/macOS, msvcrt en Windows)."""
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:   # LK_LOCK se rinde a los ~10 s: se sigue esperando
+                    pass
+        try:
+            yield
+        finally:
+            try:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _hash(code: str):
+    d = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+
+class SeenPosts:
+    """Bloom filter escalable y persistente de shortcodes vistos."""
+
+    _shared: Dict[str, "SeenPosts"] = {}
+
+    def __init__(self, path: str = SEEN_FILE, capacity: int = SEEN_CAPACITY, fp: float = SEEN_FP):
+        self.path = Path(path)
+        self.capacity, self.fp = capacity, fp
+        self.layers: List[BloomLayer] = self._read() or [BloomLayer(capacity, fp)]
+        self.added = 0        # agregados en esta corrida
+        self.dirty = False
+        self.last_save = time.monotonic()
+
+    @classmethod
+    def open(cls, path: str = SEEN_FILE, **kw) -> "SeenPosts":
+        """Una instancia por archivo y proceso (varios crawlers en el mismo proceso la comparten)."""
+        key = os.path.abspath(path)
+        if key not in cls._shared:
+            cls._shared[key] = cls(path, **kw)
+        return cls._shared[key]
+
+    # ---------- consulta / alta ----------
+    def __contains__(self, key: str) -> bool:
+        h = _hash(shortcode(key))
+        return any(h in layer for layer in self.layers)
+
+    def add(self, key: str):
+        h = _hash(shortcode(key))
+        if any(h in layer for layer in self.layers):
+            return
+        last = self.layers[-1]
+        if last.count >= last.capacity:
+            i = len(self.layers)
+            last = BloomLayer(self.capacity * 2**i, self.fp * 0.5**i)
+            self.layers.append(last)
+        last.add(h)
+        self.added += 1
+        self.dirty = True
+        if time.monotonic() - self.last_save >= SAVE_EVERY_S:
+            self.save()
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    # ---------- disco ----------
+    def _read(self) -> List[BloomLayer]|None:
+        if not self.path.exists():
+            return None
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                print(f"⚠️ {self.path} no es un registro de posts vistos; se ignora")
+                return None
+            layers = []
+            (n,) = struct.unpack("<I", f.read(4))
+            for _ in range(n):
+                m, k, cap, count = LAYER_HDR.unpack(f.read(LAYER_HDR.size))
+                layers.append(BloomLayer(cap, 0.5, bits=m, hashes=k, count=count, data=f.read((m + 7) // 8)))
+            return layers
+
+    def save(self):
+        """Guarda uniendo con el archivo actual (otro proceso pudo agregar posts mientras tanto)."""
+        self.last_save = time.monotonic()
+        if not self.dirty:
+            return
+        with _file_lock(self.path.with_suffix(self.path.suffix + ".lock")):
+            for i, disk in enumerate(self._read() or []):
+                if i < len(self.layers) and self.layers[i].same_shape(disk):
+                    self.layers[i].union(disk)
+                elif i >= len(self.layers):
+                    self.layers.append(disk)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<I", len(self.layers)))
+                for layer in self.layers:
+                    f.write(LAYER_HDR.pack(layer.m, layer.k, layer.capacity, layer.count))
+                    f.write(layer.bits)
+            tmp.replace(self.path)
+        self.dirty = False
+
+    def close(self):
+        self.save()
+
+    def summary(self) -> str:
+        kb = sum(len(layer.bits) for layer in self.layers) / 1024
+        return (f"👁️ Posts vistos: +{self.added} en esta corrida · {len(self)} en {self.path.name} "
+                f"({len(self.layers)} capa(s), {kb:.0f} KB)")
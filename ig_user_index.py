@@ -0,0 +1,167 @@
+# ig_user_index.py
+# Índice persistente de usernames para las salidas TXT (instagram.com/<user> por línea).
+#
+# En vez de leer todo ig_users.txt y pasar una regex por línea al arrancar, el
+# índice vive al lado (<txt>.uidx): una tabla hash de direccionamiento abierto con
+# un hash de 64 bits por usuario, abierta con mmap. Al arrancar solo se leen las
+# líneas agregadas después de la última actualización del índice (offset guardado en
+# la cabecera), y cada consulta toca un par de slots: el archivo no pasa entero por RAM.
+#
+# Uso:
+#   idx = UserIndex("ig_users.txt")
+#   if user not in idx:
+#       f.write(f"instagram.com/{user}\n"); f.flush()
+#       idx.add(user, f.tell())      # offset del TXT ya cubierto por el índice
+#   idx.close()
+
+import hashlib, mmap, os, re, struct
+from pathlib import Path
+
+MAGIC      = b"IGUIDX1\n"
+HEADER     = struct.Struct("<QQQ")    # slots, usuarios, bytes del TXT cubiertos
+SLOT       = struct.Struct("<Q")
+MIN_SLOTS  = 1 << 16
+MAX_LOAD   = 0.6                      # factor de carga antes de duplicar la tabla
+USER_LINE_RE = re.compile(rb"instagram\.com/([A-Za-z0-9._]+)/?\s*$")
+
+def user_hash(user: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(user.lower().encode("utf-8"), digest_size=8).digest(), "little")
+    return h or 1   # 0 = slot vacío
+
+class UserIndex:
+    def __init__(self, txt_path: str, index_path: str|None = None):
+        self.txt = Path(txt_path)
+        self.path = Path(index_path or f"{txt_path}.uidx")
+        self.f = self.mm = None
+        self._open()
+        size = self.txt.stat().st_size if self.txt.exists() else 0
+        if self.covered > size:
+            print(f"⚠️ {self.txt} es más corto que su índice; reconstruyendo {self.path.name}")
+            self._create(MIN_SLOTS)
+        if self.covered < size:
+            self._catch_up(size)
+
+    # ---------- tabla ----------
+    def _open(self):
+        if not self.path.exists() or self.path.stat().st_size < len(MAGIC) + HEADER.size:
+            self._create(MIN_SLOTS)
+            return
+        self.f = open(self.path, "r+b")
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+        slots = HEADER.unpack_from(self.mm, len(MAGIC))[0]
+        if self.mm[:len(MAGIC)] != MAGIC or len(self.mm) != self._size(slots):
+            print(f"⚠️ {self.path.name} inválido; reconstruyendo")
+            self._create(MIN_SLOTS)
+
+    @staticmethod
+    def _size(slots: int) -> int:
+        return len(MAGIC) + HEADER.size + slots * SLOT.size
+
+    def _create(self, slots: int, hashes=()):
+        """Tabla nueva (vacía o con `hashes`) escrita a un temporal y reemplazada de una vez."""
+        covered = self.covered if self.mm is not None and hashes else 0
+        self._close_map()
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.truncate(self._size(slots))
+        with open(tmp, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0)
+            mm[:len(MAGIC)] = MAGIC
+            n = 0
+            for h in hashes:
+                n += self._insert(mm, slots, h)
+            HEADER.pack_into(mm, len(MAGIC), slots, n, covered)
+            mm.flush()
+            mm.close()
+        os.replace(tmp, self.path)
+        self.f = open(self.path, "r+b")
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+
+    @staticmethod
+    def _insert(mm, slots: int, h: int) -> int:
+        """Inserta por sondeo lineal; devuelve 1 si era nuevo."""
+        base, mask = len(MAGIC) + HEADER.size, slots - 1
+        i = h & mask
+        while True:
+            cur = SLOT.unpack_from(mm, base + i * SLOT.size)[0]
+            if cur == h:
+                return 0
+            if cur == 0:
+                SLOT.pack_into(mm, base + i * SLOT.size, h)
+                return 1
+            i = (i + 1) & mask
+
+    @property
+    def slots(self) -> int:
+        return HEADER.unpack_from(self.mm, len(MAGIC))[0]
+
+    @property
+    def covered(self) -> int:
+        return HEADER.unpack_from(self.mm, len(MAGIC))[2] if self.mm is not None else 0
+
+    def __len__(self) -> int:
+        return HEADER.unpack_from(self.mm, len(MAGIC))[1]
+
+    def _hashes(self):
+        base = len(MAGIC) + HEADER.size
+        for i in range(self.slots):
+            h = SLOT.unpack_from(self.mm, base + i * SLOT.size)[0]
+            if h:
+                yield h
+
+    # ---------- API ----------
+    def __contains__(self, user: str) -> bool:
+        h, slots = user_hash(user), self.slots
+        base, mask = len(MAGIC) + HEADER.size, slots - 1
+        i = h & mask
+        while True:
+            cur = SLOT.unpack_from(self.mm, base + i * SLOT.size)[0]
+            if cur == h:
+                return True
+            if cur == 0:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, user: str, covered: int|None = None):
+        """Agrega `user`; `covered` = tamaño del TXT ya incluido en el índice (tras escribir la línea)."""
+        slots, n, cov = HEADER.unpack_from(self.mm, len(MAGIC))
+        if (n + 1) > slots * MAX_LOAD:
+            self._create(slots * 2, list(self._hashes()))
+            slots, n, cov = HEADER.unpack_from(self.mm, len(MAGIC))
+        n += self._insert(self.mm, slots, user_hash(user))
+        HEADER.pack_into(self.mm, len(MAGIC), slots, n, cov if covered is None else covered)
+
+    def _catch_up(self, size: int):
+        """Indexa solo lo que se agregó al TXT desde la última vez (o todo, la primera vez)."""
+        start = self.covered
+        added = 0
+        with open(self.txt, "rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if not line.endswith(b"\n") and pos + len(line) >= size:
+                    break   # línea a medio escribir: queda para la próxima
+                pos += len(line)
+                m = USER_LINE_RE.search(line.strip())
+                if m:
+                    before = len(self)
+                    self.add(m.group(1).decode("utf-8"), pos)
+                    added += len(self) - before
+            slots, n, _ = HEADER.unpack_from(self.mm, len(MAGIC))
+            HEADER.pack_into(self.mm, len(MAGIC), slots, n, pos)
+        if start == 0 and pos:
+            print(f"🗂️ Índice {self.path.name} creado: {len(self)} usuarios")
+        elif added:
+            print(f"🗂️ Índice {self.path.name}: +{added} usuarios agregados por fuera")
+
+    def _close_map(self):
+        if self.mm is not None:
+            self.mm.flush()
+            self.mm.close()
+            self.mm = None
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def close(self):
+        self._close_map()
@@ -1,5 +1,76 @@
 import yt_dlp
-import os
+import os, re, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+# ================== Config ==================
+WORKERS    = 4        # descargas en paralelo (un YoutubeDL por hilo)
+FRAGMENTOS = 4        # fragmentos DASH/HLS en paralelo dentro de cada descarga
+REPORTE_S  = 2.0      # cada cuánto se imprime el progreso agregado
+ARCHIVO    = "descargas.sqlite"   # registro de descargas por shortcode (None = sin registro)
+REINTENTOS = 3        # intentos por enlace fallido, sumando corridas
+SALIDA     = '%(title).80B [%(id)s].%(ext)s'   # el id evita choques entre títulos iguales
+# ============================================
+
+SHORTCODE_RE = re.compile(r"instagram\.com/(?:[A-Za-z0-9._]+/)?(?:p|reels?|tv)/([A-Za-z0-9_-]+)")
+
+def normalizar(url):
+    """(clave, url limpia): shortcode del reel/post y la URL sin ?igsh=… ni #fragmento."""
+    limpia = url.split("#")[0].split("?")[0]
+    m = SHORTCODE_RE.search(limpia)
+    return (m.group(1) if m else limpia.rstrip("/")), limpia
+
+def deduplicar(enlaces):
+    """Un enlace por shortcode, en el orden de llegada."""
+    vistos, unicos = set(), []
+    for url in enlaces:
+        clave, limpia = normalizar(url)
+        if clave not in vistos:
+            vistos.add(clave)
+            unicos.append((clave, limpia))
+    if len(unicos) < len(enlaces):
+        print(f"🔁 {len(enlaces) - len(unicos)} enlaces repetidos descartados.")
+    return unicos
+
+class ArchivoDescargas:
+    """
+    Estado persistente de cada shortcode: pendiente → descargando → ok | error.
+    Un 'descargando' que quedó de una corrida cortada se retoma (yt_dlp continúa el .part).
+    """
+
+    def __init__(self, path=ARCHIVO):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS descargas (
+            clave TEXT PRIMARY KEY, url TEXT NOT NULL, estado TEXT NOT NULL,
+            intentos INTEGER NOT NULL DEFAULT 0, error TEXT, ts INTEGER NOT NULL) WITHOUT ROWID""")
+        self.lock = threading.Lock()
+
+    def estados(self):
+        """clave -> (estado, intentos, error) de todo el registro, en una sola consulta."""
+        return {c: (e, n, err) for c, e, n, err in self.db.execute("SELECT clave, estado, intentos, error FROM descargas")}
+
+    def encolar(self, items):
+        """Alta como 'pendiente' de los (clave, url) que no estaban, en una sola transacción."""
+        now = int(time.time())
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO descargas (clave, url, estado, ts) VALUES (?, ?, 'pendiente', ?)",
+                                ((c, u, now) for c, u in items))
+            self.db.commit()
+
+    def marcar(self, clave, url, estado, error=None):
+        with self.lock:
+            self.db.execute("""INSERT INTO descargas (clave, url, estado, intentos, error, ts) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(clave) DO UPDATE SET url = excluded.url, estado = excluded.estado, error = excluded.error,
+                    ts = excluded.ts, intentos = intentos + excluded.intentos""",
+                (clave, url, estado, int(estado == "descargando"), error, int(time.time())))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+class DescargaCortada(Exception):
+    """La lanza el progress hook cuando piden parar: yt_dlp corta la descarga en curso."""
 
 def leer_links(archivo="links.txt"):
     if not os.path.exists(archivo):
@@ -15,27 +86,171 @@ def leer_links(archivo="links.txt"):
         print(f"✅ {len(enlaces)} enlaces encontrados.")
     return enlaces
 
-def descargar_videos(enlaces):
-    ydl_opts = {
-        'format': 'bestvideo+bestaudio/best',
-        'outtmpl': '%(title)s.%(ext)s',
-    }
+class Progreso:
+    """Progreso agregado de todas las descargas (lo actualizan los hilos vía progress_hooks)."""
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        for url in enlaces:
-            try:
-                print(f"\n⬇️ Descargando: {url}")
-                ydl.download([url])
-            except Exception as e:
-                print(f"❌ Error al descargar {url}: {e}")
+    def __init__(self, total):
+        self.total = total
+        self.ok = self.errores = 0
+        self.bytes_listos = 0          # de descargas terminadas
+        self.activas = {}              # url -> (bytes bajados, velocidad B/s)
+        self.inicio = time.monotonic()
+        self.lock = threading.Lock()
+
+    def hook(self, url, d):
+        with self.lock:
+            if d.get("status") == "downloading":
+                self.activas[url] = (d.get("downloaded_bytes") or 0, d.get("speed") or 0)
+            elif d.get("status") == "finished":
+                # un enlace puede bajar varios archivos (video + audio): se suman
+                self.bytes_listos += d.get("total_bytes") or d.get("downloaded_bytes") or 0
+                self.activas.pop(url, None)
+
+    def terminar(self, url, ok):
+        with self.lock:
+            self.activas.pop(url, None)
+            if ok:
+                self.ok += 1
+            else:
+                self.errores += 1
+
+    def linea(self):
+        with self.lock:
+            hechos = self.ok + self.errores
+            mb = (self.bytes_listos + sum(b for b, _ in self.activas.values())) / 1e6
+            vel = sum(v for _, v in self.activas.values()) / 1e6
+            activas = len(self.activas)
+        seg = time.monotonic() - self.inicio
+        return (f"📊 {hechos}/{self.total} listos ({self.errores} con error) · {activas} en curso · "
+                f"{mb:.1f} MB · {vel:.1f} MB/s · {seg:.0f} s")
+
+def descargar_videos(enlaces, on_result=None, workers=WORKERS, fragmentos=FRAGMENTOS, archivo=ARCHIVO,
+                     carpeta=None, parar=None):
+    # on_result(dict) se llama al terminar cada enlace (lo usa ig_daemon.py); puede llegar desde cualquier hilo.
+    # Los salteados por el registro también llegan, con "skipped": True (ok o el último error).
+    # carpeta: dónde van los videos (None = directorio actual). parar: threading.Event; al setearlo
+    # no arrancan más descargas y las en curso se cortan (quedan 'pendiente' para retomarlas).
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    cola = deduplicar(enlaces)
+    registro = ArchivoDescargas(archivo) if archivo else None
+    if registro:
+        estados = registro.estados()
+        pendientes, reintentos, listos, agotados = [], [], 0, 0
+        for clave, url in cola:
+            estado, intentos, error = estados.get(clave, ("pendiente", 0, None))
+            if estado == "ok":
+                listos += 1
+                if on_result:
+                    on_result({"url": url, "ok": True, "skipped": True})
+            elif estado != "error":
+                pendientes.append((clave, url))    # nuevos y cortados a medias, primero
+            elif intentos < REINTENTOS:
+                reintentos.append((clave, url))
+            else:
+                agotados += 1
+                if on_result:
+                    on_result({"url": url, "ok": False, "skipped": True,
+                               "error": f"sin más reintentos ({intentos}): {error}"})
+        if listos or agotados or reintentos:
+            print(f"⏭️ Ya descargados: {listos} · a reintentar: {len(reintentos)} · "
+                  f"sin más reintentos: {agotados} (ver {archivo})")
+        registro.encolar(c for c in pendientes if c[0] not in estados)
+        cola = pendientes + reintentos
+    progreso = Progreso(len(cola))
+    local = threading.local()
+    instancias, lock = [], threading.Lock()
+
+    def ydl_del_hilo():
+        # YoutubeDL no es thread-safe: una instancia por hilo, reutilizada entre enlaces
+        if not hasattr(local, "ydl"):
+            # el hook lo llaman también los hilos de fragmentos de yt_dlp, donde `local` está vacío:
+            # la URL en curso va en un dict propio de esta instancia, capturado por el closure
+            actual = local.actual = {"url": None}
+
+            def hook(d):
+                if parar is not None and parar.is_set():
+                    raise DescargaCortada("descarga cancelada")
+                progreso.hook(actual["url"], d)
+            local.ydl = yt_dlp.YoutubeDL({
+                'format': 'bestvideo+bestaudio/best',
+                'outtmpl': os.path.join(carpeta, SALIDA) if carpeta else SALIDA,
+                'concurrent_fragment_downloads': fragmentos,
+                'quiet': True,
+                'noprogress': True,   # las barras de N hilos se pisan: va el reporte agregado
+                'progress_hooks': [hook],
+            })
+            with lock:
+                instancias.append(local.ydl)
+        return local.ydl
+
+    def descargar(item):
+        clave, url = item
+        if parar is not None and parar.is_set():
+            return
+        try:
+            print(f"⬇️ Descargando: {url}")
+            ydl = ydl_del_hilo()
+            local.actual["url"] = url
+            if registro:
+                registro.marcar(clave, url, "descargando")
+            ydl.download([url])
+            if registro:
+                registro.marcar(clave, url, "ok")
+            progreso.terminar(url, True)
+            print(f"✅ {url}")
+            if on_result:
+                on_result({"url": url, "ok": True})
+        except Exception as e:
+            if parar is not None and parar.is_set():
+                # cortada a pedido: no cuenta como intento fallido
+                if registro:
+                    registro.marcar(clave, url, "pendiente")
+                progreso.terminar(url, False)
+                print(f"⏹️ Cortada: {url}")
+                return
+            if registro:
+                registro.marcar(clave, url, "error", str(e))
+            progreso.terminar(url, False)
+            print(f"❌ Error al descargar {url}: {e}")
+            if on_result:
+                on_result({"url": url, "ok": False, "error": str(e)})
+
+    fin = threading.Event()
+    def reportar():
+        while not fin.wait(REPORTE_S):
+            print(progreso.linea())
+    reporter = threading.Thread(target=reportar, daemon=True)
+    reporter.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(descargar, cola))
+    finally:
+        fin.set()
+        reporter.join()
+        for ydl in instancias:
+            ydl.close()
+        if registro:
+            registro.close()
+        print(progreso.linea())
 
 if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Descarga en bloque los videos de links.txt")
+    p.add_argument("--links", default="links.txt")
+    p.add_argument("--workers", type=int, default=WORKERS, help="Descargas en paralelo")
+    p.add_argument("--fragmentos", type=int, default=FRAGMENTOS, help="Fragmentos en paralelo por descarga")
+    p.add_argument("--archivo", default=ARCHIVO, help="Registro SQLite de descargas (se saltean las ya hechas)")
+    p.add_argument("--sin-archivo", dest="archivo", action="store_const", const=None, help="Descargar todo, sin registro")
+    a = p.parse_args()
+
     print("=== Instagram Video Downloader 1080p ===")
 
-    links = leer_links()
+    links = leer_links(a.links)
 
     if links:
-        descargar_videos(links)
+        descargar_videos(links, workers=a.workers, fragmentos=a.fragmentos, archivo=a.archivo)
     else:
         print("No se pudieron procesar los enlaces.")
 
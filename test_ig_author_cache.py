@@ -0,0 +1,24 @@
+# test_ig_author_cache.py
+# Pruebas de la caché post→autor (python -m pytest -q). SQLite en un directorio temporal.
+
+from ig_author_cache import PostAuthorCache
+
+def test_lru_keeps_newest_within_same_second(tmp_path):
+    cache = PostAuthorCache(str(tmp_path / "authors.sqlite"), max_entries=10)
+    for i in range(300):
+        cache.put(f"C{i}", f"u{i}")
+    cache.flush()
+    assert cache.get("C299") == "u299"
+    assert cache.get("C0") is None
+    kept = [code for (code,) in cache.db.execute("SELECT code FROM post_authors ORDER BY used_at")]
+    assert kept == [f"C{i}" for i in range(290, 300)]
+
+def test_hit_refreshes_lru_order(tmp_path):
+    cache = PostAuthorCache(str(tmp_path / "authors.sqlite"), max_entries=3)
+    for i in range(3):
+        cache.put(f"C{i}", f"u{i}")
+    assert cache.get("C0") == "u0"
+    cache.put("C3", "u3")
+    cache.flush()
+    assert cache.get("C0") == "u0"
+    assert cache.get("C1") is None
@@ -0,0 +1,46 @@
+# test_ig_graph_store.py
+# Pruebas del grafo en SQLite (python -m pytest -q). Base en memoria, sin navegador.
+
+from ig_graph_store import GraphStore
+
+def crawls(store, *lists, which="followers"):
+    for users in lists:
+        store.record_crawl("owner", which, users)
+
+def test_changes_since_last():
+    with GraphStore(":memory:") as g:
+        crawls(g, ["a", "b", "c"], ["a", "c", "d"])
+        assert g.changes_since_last("owner", "followers") == (["d"], ["b"])
+        assert g.current("owner", "followers") == ["a", "c", "d"]
+
+def test_refollow_counts_as_added():
+    with GraphStore(":memory:") as g:
+        crawls(g, ["a", "b"], ["a"], ["a", "b"])
+        assert g.changes_since_last("owner", "followers") == (["b"], [])
+
+def test_continuing_edge_is_not_added():
+    with GraphStore(":memory:") as g:
+        crawls(g, ["a", "b"], ["a", "b"])
+        assert g.changes_since_last("owner", "followers") == ([], [])
+
+def test_incremental_keeps_unscanned_tail():
+    with GraphStore(":memory:") as g:
+        crawls(g, ["a", "b", "c", "d"])
+        # corte por racha de conocidos en "b" (pos 1): c y d no se recorrieron
+        g.record_incremental("owner", "followers", ["x", "a", "b"], 1)
+        assert g.current("owner", "followers") == ["a", "b", "c", "d", "x"]
+        assert g.changes_since_last("owner", "followers") == (["x"], [])
+
+def test_incremental_drops_skipped_head():
+    with GraphStore(":memory:") as g:
+        crawls(g, ["a", "b", "c", "d"])
+        g.record_incremental("owner", "followers", ["x", "b", "c"], 2)
+        assert g.current("owner", "followers") == ["b", "c", "d", "x"]
+        assert g.changes_since_last("owner", "followers") == (["x"], ["a"])
+
+def test_scan_to_end_is_a_full_snapshot():
+    with GraphStore(":memory:") as g:
+        # sin racha de conocidos lo recorrido es la lista entera: c y d son bajas
+        crawls(g, ["a", "b", "c", "d"], ["x", "a", "b"])
+        assert g.current("owner", "followers") == ["a", "b", "x"]
+        assert g.changes_since_last("owner", "followers") == (["x"], ["c", "d"])